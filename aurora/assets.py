@@ -0,0 +1,147 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from .fingerprints import hash_file
+
+# the number of assets copied at once. Copying is bound by disk I/O, not the CPU
+COPY_THREADS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def is_unchanged(source_stat: os.stat_result, source: str, destination: str) -> bool:
+    """
+    Check whether `destination` is already a copy of `source`.
+
+    Files of different sizes are never compared. Files with the same size and modification
+    time are assumed to be the same, as asset copies keep the modification time of the
+    original; otherwise, their content hashes are compared.
+    """
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+
+    if destination_stat.st_size != source_stat.st_size:
+        return False
+
+    # i.e. the asset was hardlinked in the last build
+    if os.path.samestat(source_stat, destination_stat):
+        return True
+
+    if destination_stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return True
+
+    if hash_file(source) != hash_file(destination):
+        return False
+
+    shutil.copystat(source, destination)
+
+    return True
+
+
+def copy_file(source: str, destination: str) -> None:
+    """
+    Copy a file, using `os.copy_file_range` where it is available so the kernel can copy
+    the file without reading it into memory, or share its blocks on filesystems that
+    support reflinks.
+    """
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(source, destination)
+        return
+
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        try:
+            while os.copy_file_range(
+                source_file.fileno(), destination_file.fileno(), 1024 * 1024 * 1024
+            ):
+                pass
+        except OSError:
+            # i.e. the files are on different filesystems on an older kernel
+            source_file.seek(0)
+            destination_file.seek(0)
+            destination_file.truncate()
+            shutil.copyfileobj(source_file, destination_file)
+
+
+def publish_asset(
+    source: str, destination: str, link: bool = False, previous_destination: str = None
+) -> bool:
+    """
+    Copy an asset to the site directory, unless an identical copy is already there.
+
+    If `link` is set, the asset is hardlinked instead of copied where possible. If
+    `previous_destination` (i.e. the asset in the last build of a staged build) is an
+    identical copy, it is hardlinked to `destination`.
+
+    Returns True if the asset was copied or linked, and False if it was unchanged.
+    """
+    source_stat = os.stat(source)
+
+    if is_unchanged(source_stat, source, destination):
+        return False
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    # the old file may be a hardlink to an asset, which must not be overwritten
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    if previous_destination and is_unchanged(source_stat, source, previous_destination):
+        try:
+            os.link(previous_destination, destination)
+            return False
+        except OSError:
+            pass
+
+    if link:
+        try:
+            os.link(source, destination)
+            return True
+        except OSError:
+            pass
+
+    copy_file(source, destination)
+    shutil.copystat(source, destination)
+
+    return True
+
+
+def publish_assets(
+    source_directory: str,
+    site_directory: str,
+    link: bool = False,
+    previous_site_directory: str = None,
+) -> tuple:
+    """
+    Copy every file in `source_directory` to the same path in `site_directory`, i.e.
+    `assets/styles.css` to `_site/assets/styles.css`, on COPY_THREADS threads.
+
+    If `previous_site_directory` is set, unchanged assets are hardlinked from it.
+
+    Returns the paths of every published asset and the number of assets that were copied.
+    """
+    assets = []
+
+    for root, _, files in os.walk(source_directory):
+        for file in files:
+            source = os.path.join(root, file)
+            assets.append(
+                (
+                    source,
+                    os.path.join(site_directory, source),
+                    previous_site_directory
+                    and os.path.join(previous_site_directory, source),
+                )
+            )
+
+    with ThreadPoolExecutor(max_workers=COPY_THREADS) as executor:
+        copied = sum(
+            executor.map(
+                lambda asset: publish_asset(
+                    asset[0], asset[1], link=link, previous_destination=asset[2]
+                ),
+                assets,
+            )
+        )
+
+    return [destination for _, destination, _ in assets], copied
@@ -63,21 +63,40 @@ SITE_STATE = {}
 
 @click.command("build")
 @click.option("--incremental", is_flag=True)
-def build(incremental):
+@click.option("--jobs", "-j", default=1, type=click.IntRange(min=1))
+@click.option("--write-if-changed", is_flag=True)
+@click.option("--profile", is_flag=True)
+@click.option("--profile-output", type=click.Path(dir_okay=False))
+@click.option("--trace", type=click.Path(dir_okay=False))
+def build(incremental, jobs, write_if_changed, profile, profile_output, trace):
+    from contextlib import nullcontext
+
     from .graph import main as build_site
+    from .profiling import record_calls
 
-    # import cProfile
-    # cProfile.run("build_site(incremental=incremental)", sort="cumulative")
     print("Building site...")
-    build_site(incremental=incremental)
+
+    with record_calls(profile_output) if profile_output else nullcontext():
+        build_site(
+            incremental=incremental,
+            jobs=jobs,
+            write_if_changed=write_if_changed,
+            profile=profile or bool(profile_output),
+            trace=trace,
+        )
+
+    if profile_output:
+        print(f"Saved call statistics to {profile_output}.")
+
     print("Done! ✨")
 
 
 @click.command("serve")
-def serve():
+@click.option("--debounce", default=0.25, type=click.FloatRange(min=0))
+def serve(debounce):
     from .graph import main as build_site
 
-    build_site(watch=True)
+    build_site(watch=True, debounce=debounce)
 
 
 main.add_command(new)
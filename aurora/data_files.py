@@ -0,0 +1,264 @@
+import codecs
+import csv
+import datetime
+import itertools
+import json
+import os
+
+import orjson
+
+from .fingerprints import get_file_fingerprint
+
+# read streamed data files in 1 MB chunks
+READ_SIZE = 1024 * 1024
+
+# the types CSV columns can be declared as, and the function that converts a value to each type
+COLUMN_TYPES = {
+    "int": int,
+    "float": float,
+    "date": datetime.date.fromisoformat,
+    "str": str,
+}
+
+
+def iterate_json_array(path: str):
+    """
+    Yield the items of the top-level JSON array in a file, one at a time.
+
+    Only the item being decoded and one read buffer are held in memory, so arrays larger
+    than the available memory can be read. If the file holds a single object rather
+    than an array, that object is yielded.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, encoding="utf-8-sig") as f:
+        buffer = ""
+
+        while not buffer:
+            chunk = f.read(READ_SIZE)
+            buffer = chunk.lstrip()
+
+            if not chunk:
+                break
+
+        if not buffer.startswith("["):
+            yield orjson.loads(buffer + f.read())
+            return
+
+        position = 1
+        end_of_file = False
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+
+            if position == len(buffer):
+                if end_of_file:
+                    raise ValueError(f"{path} ends before its JSON array is closed.")
+
+                chunk = f.read(READ_SIZE)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            if buffer[position] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+
+                chunk = f.read(READ_SIZE)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            next_position = end
+
+            while next_position < len(buffer) and buffer[next_position] in " \t\r\n":
+                next_position += 1
+
+            # an item must be followed by a comma or the end of the array. If it is not, the
+            # item may be a number that continues in the next chunk (i.e. `1.` of `1.5`)
+            if next_position == len(buffer) or buffer[next_position] not in ",]":
+                if not end_of_file:
+                    chunk = f.read(READ_SIZE)
+                    end_of_file = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+
+                if next_position < len(buffer):
+                    raise ValueError(f"{path} is not a valid JSON array.")
+
+            yield item
+
+            position = end
+
+
+def iterate_json_lines(path: str):
+    """
+    Yield the JSON document on each non-empty line of a JSON Lines (`.jsonl`) file.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def get_column_converters(column_types: dict) -> dict:
+    """
+    Get the function that converts the values of each column declared in `column_types`, i.e. `{"rating": "int"}`.
+    """
+    converters = {}
+
+    for column, column_type in column_types.items():
+        if column_type not in COLUMN_TYPES:
+            raise ValueError(
+                f"{column} is declared as {column_type}, which is not one of: {', '.join(COLUMN_TYPES)}."
+            )
+
+        converters[column] = COLUMN_TYPES[column_type]
+
+    return converters
+
+
+def iterate_csv(path: str, column_types: dict = None, encoding: str = "utf-8"):
+    """
+    Yield the rows of a CSV file, one at a time, as dictionaries keyed by the header row.
+    A byte order mark at the start of a UTF-8 file is ignored.
+
+    Values in the columns declared in `column_types` are converted to that type once, as
+    they are read. Surrounding whitespace is ignored when converting a value, and empty
+    values are converted to None. Values in other columns are left as strings.
+    """
+    converters = get_column_converters(column_types or {})
+
+    if codecs.lookup(encoding).name == "utf-8":
+        encoding = "utf-8-sig"
+
+    # newline="" lets the csv module read quoted values that span several lines
+    with open(path, encoding=encoding, newline="") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=2):
+            for column, convert in converters.items():
+                value = row.get(column)
+
+                if value is None:
+                    continue
+
+                value = value.strip()
+
+                try:
+                    row[column] = convert(value) if value else None
+                except ValueError:
+                    raise ValueError(
+                        f"{path}, row {row_number}: {value!r} in the {column} column is not a valid {column_types[column]}."
+                    )
+
+            yield row
+
+
+def iterate_data_file(path: str, column_types: dict = None, encoding: str = "utf-8"):
+    """
+    Yield the records in a data file without reading the whole file into memory.
+
+    `encoding` is only used for CSV files, as JSON is always read as UTF-8.
+    """
+    extension = os.path.splitext(path)[-1].replace(".", "")
+
+    if extension == "json":
+        return iterate_json_array(path)
+    if extension == "jsonl":
+        return iterate_json_lines(path)
+    if extension == "csv":
+        return iterate_csv(path, column_types, encoding)
+
+    raise ValueError(f"Data files with the .{extension} extension cannot be streamed.")
+
+
+def prepare_records(records, data_dir: str):
+    """
+    Give every record a `slug` and a `layout`, as records are given when data files are loaded.
+
+    Records without a `slug` are numbered in the order they appear.
+    """
+    idx = 0
+
+    for record in records:
+        if not record.get("slug"):
+            record["slug"] = str(idx)
+            idx += 1
+
+        if not record.get("layout"):
+            record["layout"] = data_dir
+
+        yield record
+
+
+def chunked(iterable, size: int):
+    """
+    Split an iterable into lists of at most `size` items.
+    """
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+class StreamedCollection:
+    """
+    The records in a streamed data file, available to templates as `site.<collection>`.
+
+    The file is read again every time the collection is iterated over, so records are
+    never all held in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        data_dir: str,
+        column_types: dict = None,
+        encoding: str = "utf-8",
+    ):
+        self.path = path
+        self.data_dir = data_dir
+        self.column_types = column_types
+        self.encoding = encoding
+        self._length = None
+        self._fingerprint = None
+
+    def __iter__(self):
+        return prepare_records(
+            iterate_data_file(self.path, self.column_types, self.encoding),
+            self.data_dir,
+        )
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = sum(
+                1
+                for _ in iterate_data_file(self.path, self.column_types, self.encoding)
+            )
+
+        return self._length
+
+    def __bool__(self) -> bool:
+        return next(iter(self), None) is not None
+
+    def fingerprint(self) -> str:
+        """
+        Get the content hash of the data file.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = get_file_fingerprint(self.path)["hash"]
+
+        return self._fingerprint
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+# read files in 1 MB chunks when hashing them
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Compute a fast content hash of a bytes object.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """
+    Compute a fast content hash of a file without reading the whole file into memory.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_file_fingerprint(path: str, previous_fingerprint: dict = None) -> dict:
+    """
+    Get the size, modification time and content hash of a file.
+
+    If the size and modification time match `previous_fingerprint`, the file is not read
+    and the previous hash is reused.
+    """
+    stat = os.stat(path)
+
+    if (
+        previous_fingerprint
+        and previous_fingerprint.get("size") == stat.st_size
+        and previous_fingerprint.get("mtime") == stat.st_mtime_ns
+    ):
+        return previous_fingerprint
+
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": hash_file(path),
+    }
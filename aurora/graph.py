@@ -5,19 +5,25 @@ import sys
 if not os.path.exists("config.py"):
     raise Exception("config.py not found")
 
-import csv
+import codecs
 import datetime
+import functools
 import hashlib
+import itertools
 import json
+import locale
+import multiprocessing
 import re
-from copy import deepcopy
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy, deepcopy
 
 import chardet
+import frontmatter
 import orjson
 import pyromark
 import tqdm
 from frontmatter import loads
-from bs4 import BeautifulSoup
 from jinja2 import (
     Environment,
     FileSystemBytecodeCache,
@@ -28,9 +34,16 @@ from jinja2 import (
 )
 from jinja2.visitor import NodeVisitor
 from toposort import toposort_flatten
-from yaml.reader import ReaderError
-from collections import defaultdict
 
+from . import __version__
+from .assets import publish_asset, publish_assets
+from .data_files import (
+    READ_SIZE,
+    StreamedCollection,
+    chunked,
+    iterate_csv,
+    prepare_records,
+)
 from .date_helpers import (
     archive_date,
     date_to_xml_string,
@@ -39,11 +52,29 @@ from .date_helpers import (
     month_number_to_written_month,
     year,
 )
+from .fingerprints import get_file_fingerprint, hash_bytes, hash_file
+from .links import get_outgoing_links
+from .neighbours import (
+    find_neighbouring_pages,
+    get_category_keys,
+    get_neighbour_links,
+    link_neighbouring_pages,
+)
+from .profiling import BuildProfile, Phase, Span, Trace, get_hook_name
+from .render_cache import RenderCache
+from .staging import (
+    can_swap_site_directory,
+    create_staging_directory,
+    move_into_site_directory,
+    remove_in_background,
+    swap_site_directory,
+)
+from .watch import DEFAULT_DEBOUNCE_WINDOW, ChangeCollector
+from .writer import SiteWriter
 
 module_dir = os.getcwd()
 os.chdir(module_dir)
 sys.path.append(module_dir)
-state_to_write = {}
 original_file_to_permalink = {}
 normalized_collection_permalinks = {}
 
@@ -56,8 +87,8 @@ from config import (
     LAYOUTS_BASE_DIR,
     ROOT_DIR,
     SITE_DIR,
-    SITE_STATE,
     SITE_ENV,
+    SITE_STATE,
 )
 
 ALLOWED_EXTENSIONS = ["html", "md", "css", "js", "txt", "xml"]
@@ -65,28 +96,78 @@ ALLOWED_EXTENSIONS = ["html", "md", "css", "js", "txt", "xml"]
 saved_pages = set()
 permalinks = defaultdict(list)
 all_data_files = {}
+streamed_data_files = {}
 all_pages = []
 all_opened_pages = {}
 all_page_contents = {}
 collections_to_files = {}
 all_dependencies = {}
 all_parsed_pages = {}
-dates = set()
-years = {}
 reverse_deps = {}
 collection_permalinks_to_idx = {}
 layout_permalinks_to_idx = {}
+source_digests = {}
+template_digests = {}
+# whether each template reads `site` as a whole, so the `site.*` keys it reads are not known
+templates_reading_site = {}
+compiled_layouts = {}
+layout_chains = {}
+archive_indexes = {}
+layout_digests = {}
+sorted_collections = {}
+item_digests = {}
+# the encodings detected for files that could not be read with the preferred encoding
+file_encodings = {}
+render_cache = None
+site_writer = None
+# while serving, pages, data files and the state of the last build are kept in memory between builds
+resident_pages = {}
+resident_data_files = {}
+resident_state = {}
+# the digests of the archive layouts in the last build while serving
+resident_archive_digests = {}
+
+# the phases of the current build are measured here when `aurora build --profile` or `--trace` is used
+build_profile = None
+# front matter cache hits and misses counted in worker processes
+worker_front_matter_cache_stats = {"hits": 0, "misses": 0}
 
 # ensures a single template cannot have more than 10 levels of inheritance
 INHERITANCE_LIMIT = 10
 
+RENDER_CACHE_DIR = SITE_STATE.get("render_cache_dir", ".aurora_cache")
+# 512 MB
+RENDER_CACHE_MAX_SIZE = SITE_STATE.get("render_cache_max_size", 512 * 1024 * 1024)
+
+# the number of compiled front matter expressions kept in memory
+FRONT_MATTER_CACHE_SIZE = SITE_STATE.get("front_matter_cache_size", 4096)
+
 DATA_FILES_DIR = os.path.join(ROOT_DIR, "_data")
 
+# the number of bytes read to detect the encoding of a file that is not in the preferred encoding
+ENCODING_DETECTION_SIZE = 64 * 1024
+
+# data files (relative to DATA_FILES_DIR) whose records are streamed instead of loaded into memory
+STREAMED_DATA_FILES = set(SITE_STATE.get("streamed_data_files", []))
+# the number of records of a streamed data file that are turned into pages at a time
+DATA_CHUNK_SIZE = SITE_STATE.get("data_chunk_size", 1000)
+# the types of CSV columns, by data file, i.e. {"reviews.csv": {"stars": "int", "date": "date"}}
+DATA_COLUMN_TYPES = SITE_STATE.get("data_column_types", {})
+
 EVALUATED_REGISTERED_TEMPLATE_GENERATION_HOOKS = {}
 EVALUATED_POST_TEMPLATE_GENERATION_HOOKS = {}
 EVALUATED_POST_BUILD_HOOKS = {}
 
 
+class Page:
+    """
+    The `page` object passed to layouts.
+    """
+
+    def __init__(self, front_matter):
+        self.__dict__.update(front_matter)
+
+
 class Post:
     def __init__(self, front_matter):
         self.__dict__.update(front_matter)
@@ -114,20 +195,28 @@ for file_name, hooks in HOOKS.get("post_build", {}).items():
         getattr(__import__(file_name), func) for func in hooks
     ]
 
-today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-state = {
-    "posts": [],
-    "backlinks": defaultdict(list),
-    "root_url": BASE_URL,
-    "build_date": today.strftime("%m-%d"),
-    "pages": [],
-    "build_timestamp": datetime.datetime.now().isoformat(),
-    "environment": SITE_ENV,
-}
 
-file_extensions = {}
+def get_initial_state() -> dict:
+    """
+    Get the site state every build starts from.
+    """
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return {
+        "posts": [],
+        "backlinks": defaultdict(list),
+        "root_url": BASE_URL,
+        "build_date": today.strftime("%m-%d"),
+        "pages": [],
+        "build_timestamp": datetime.datetime.now().isoformat(),
+        "environment": SITE_ENV,
+        **SITE_STATE,
+    }
+
+
+state = get_initial_state()
 
-state.update(SITE_STATE)
+file_extensions = {}
 
 JINJA2_ENV = Environment(
     loader=FileSystemLoader(ROOT_DIR),
@@ -146,6 +235,26 @@ for file_name, hooks in HOOKS.get("template_filters", {}).items():
     for hook in hooks:
         JINJA2_ENV.filters[hook] = getattr(__import__(file_name), hook)
 
+
+def get_hook_source_digest() -> str:
+    """
+    Get a digest of the source files of the modules hooks and template filters are loaded from.
+    """
+    digest = hashlib.sha1()
+    modules = {file_name for hooks in HOOKS.values() for file_name in hooks}
+
+    for file_name in sorted(modules):
+        path = getattr(__import__(file_name), "__file__", None)
+
+        if path and os.path.isfile(path):
+            digest.update(f"{file_name}:{hash_file(path)}".encode())
+
+    return digest.hexdigest()
+
+
+# hooks and template filters change rendered pages, so their code is part of the render cache key
+HOOK_SOURCE_DIGEST = get_hook_source_digest()
+
 md = pyromark.Markdown(
     options=(
         pyromark.Options.ENABLE_FOOTNOTES
@@ -155,24 +264,111 @@ md = pyromark.Markdown(
 )
 
 
+def detect_encoding(raw_data: bytes) -> str:
+    """
+    Detect the encoding of a file from the first ENCODING_DETECTION_SIZE bytes of its contents.
+
+    If the file cannot be decoded with the encoding detected from the first bytes, the
+    encoding is detected from the whole file.
+    """
+    encoding = chardet.detect(raw_data[:ENCODING_DETECTION_SIZE])["encoding"]
+
+    if encoding and len(raw_data) > ENCODING_DETECTION_SIZE:
+        try:
+            raw_data.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            encoding = chardet.detect(raw_data)["encoding"]
+
+    return encoding
+
+
 def read_file(file_name, mode="r") -> str:
     """
     Read a file and return its contents.
+
+    The file is read once. If it cannot be decoded with the preferred encoding, its encoding
+    is detected, and saved in `file_encodings` so later builds do not detect it again.
     """
     try:
-        with open(file_name, mode) as file:
-            return file.read()
-    except UnicodeDecodeError as e:
-        raw_data = open(file_name, "rb").read()
-        result = chardet.detect(raw_data)
-        encoding = result["encoding"]
-
         with open(file_name, "rb") as file:
-            return file.read().decode(encoding)
+            raw_data = file.read()
+            stat = os.fstat(file.fileno())
     except Exception as e:
         print(f"Error reading {file_name}")
         raise e
 
+    if "b" in mode:
+        return raw_data
+
+    known_encoding = file_encodings.get(file_name)
+
+    if (
+        known_encoding
+        and known_encoding["size"] == stat.st_size
+        and known_encoding["mtime"] == stat.st_mtime_ns
+    ):
+        encoding = known_encoding["encoding"]
+    else:
+        encoding = locale.getpreferredencoding(False)
+
+    try:
+        contents = raw_data.decode(encoding)
+    except UnicodeDecodeError:
+        encoding = detect_encoding(raw_data)
+        contents = raw_data.decode(encoding)
+
+        file_encodings[file_name] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "encoding": encoding,
+        }
+
+    # files are read as bytes, so line endings are normalized as they are in text mode
+    if "\r" in contents:
+        contents = contents.replace("\r\n", "\n").replace("\r", "\n")
+
+    return contents
+
+
+def get_file_encoding(file_name: str) -> str:
+    """
+    Get the encoding of a file that is parsed as it is read, i.e. a CSV data file.
+
+    The file is decoded READ_SIZE bytes at a time, so it is never held in memory at once. If
+    it cannot be decoded with the preferred encoding, its encoding is detected as it is by
+    `read_file`. The encoding is saved in `file_encodings` until the file changes.
+    """
+    stat = os.stat(file_name)
+    known_encoding = file_encodings.get(file_name)
+
+    if (
+        known_encoding
+        and known_encoding["size"] == stat.st_size
+        and known_encoding["mtime"] == stat.st_mtime_ns
+    ):
+        return known_encoding["encoding"]
+
+    encoding = locale.getpreferredencoding(False)
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    try:
+        with open(file_name, "rb") as file:
+            while chunk := file.read(READ_SIZE):
+                decoder.decode(chunk)
+
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        with open(file_name, "rb") as file:
+            encoding = detect_encoding(file.read())
+
+    file_encodings[file_name] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "encoding": encoding,
+    }
+
+    return encoding
+
 
 def slugify(value: str) -> str:
     """
@@ -188,9 +384,26 @@ class VariableVisitor(NodeVisitor):
 
     def __init__(self):
         self.variables = set()
+        # names read as a whole (i.e. `site["posts"]`, `site.get("posts")` or `site` passed to
+        # a filter), rather than only through their attributes
+        self.whole_names = set()
+        self.attribute_roots = set()
 
     def visit_Name(self, node, *args, **kwargs) -> None:
         self.variables.add(node.name)
+
+        if id(node) not in self.attribute_roots:
+            self.whole_names.add(node.name)
+
+        self.generic_visit(node, *args, **kwargs)
+
+    def visit_Call(self, node, *args, **kwargs) -> None:
+        # a method can read any value of the variable it is called on
+        if isinstance(node.node, nodes.Getattr) and isinstance(
+            node.node.node, nodes.Name
+        ):
+            self.whole_names.add(node.node.node.name)
+
         self.generic_visit(node, *args, **kwargs)
 
     def visit_Getattr(self, node, *args, **kwargs) -> None:
@@ -201,19 +414,19 @@ class VariableVisitor(NodeVisitor):
             current_node = current_node.node
         if isinstance(current_node, nodes.Name):
             variable_chain.append(current_node.name)
+            self.attribute_roots.add(id(current_node))
         full_variable = ".".join(reversed(variable_chain))
         self.variables.add(full_variable)
         self.generic_visit(node, *args, **kwargs)
 
 
-def get_file_dependencies_and_evaluated_contents(
-    file_name: str, contents: Template
-) -> tuple:
+def get_template_dependencies(file_name: str) -> set:
     """
     Get all dependencies of a file. Dependencies are:
 
-    1. Other files that are included in the file, and;
-    2. Variables whose values are defined by the site generator (i.e. `site.*`).
+    1. Other files that are included in the file;
+    2. Variables whose values are defined by the site generator (i.e. `site.*`), and;
+    3. The files of every collection the file reads (i.e. `site.books`).
     """
     template = JINJA2_ENV.parse(all_page_contents[file_name])
 
@@ -229,6 +442,8 @@ def get_file_dependencies_and_evaluated_contents(
     for var in visitor.variables:
         included_variables.append(var)
 
+    templates_reading_site[file_name] = "site" in visitor.whole_names
+
     dependencies = set()
 
     for include in includes:
@@ -238,17 +453,26 @@ def get_file_dependencies_and_evaluated_contents(
             dependencies.add(os.path.join(ROOT_DIR, include.template.value))
 
     for variable in included_variables:
-        variable = variable.replace("site.", "")
+        # site.books.title -> books
+        if variable.startswith("site."):
+            variable = variable.split(".")[1]
 
-        for collection in collections_to_files:
-            if collections_to_files.get(collection):
-                dependencies.update(collections_to_files[collection])
+        if collections_to_files.get(variable):
+            dependencies.update(collections_to_files[variable])
 
         if variable in state:
             dependencies.add(variable)
 
-    parsed_content = all_page_contents[file_name]
+    return dependencies
 
+
+def evaluate_front_matter(file_name: str, parsed_content) -> None:
+    """
+    Add the values Aurora computes for every page to its front matter.
+
+    These are the page's `slug`, rendered `contents`, `url`, `permalink` and `categories`,
+    and, for posts whose file name starts with a date, the post's date.
+    """
     if not parsed_content.get("slug"):
         parsed_content["slug"] = file_name.split("/")[-1].replace(".html", "")
 
@@ -316,6 +540,38 @@ def get_file_dependencies_and_evaluated_contents(
                 "url"
             ] = f"{BASE_URL}/{date_slug}/{slug_without_date.replace('.html', '').replace('.md', '')}/"
 
+
+def get_file_dependencies_and_evaluated_contents(
+    file_name: str,
+    contents: Template,
+    known_dependencies: list = None,
+    evaluated_front_matter: dict = None,
+) -> tuple:
+    """
+    Get all dependencies of a file and evaluate its front matter.
+
+    If `known_dependencies` is set (i.e. from the last incremental build), the template is not parsed again.
+    If `evaluated_front_matter` is set (i.e. kept in memory while serving), it is used instead of
+    evaluating the front matter again.
+    """
+    if known_dependencies is None:
+        dependencies = get_template_dependencies(file_name)
+    else:
+        dependencies = set(known_dependencies)
+
+    parsed_content = all_page_contents[file_name]
+
+    if evaluated_front_matter is None:
+        with Phase(build_profile, "front matter evaluation", items=1):
+            evaluate_front_matter(file_name, parsed_content)
+    else:
+        parsed_content.metadata.update(
+            {
+                key: copy(value) if isinstance(value, dict) else value
+                for key, value in evaluated_front_matter.items()
+            }
+        )
+
     if "layout" in parsed_content:
         dependencies.add(
             f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{parsed_content['layout']}.html"
@@ -360,11 +616,189 @@ def get_file_dependencies_and_evaluated_contents(
     return dependencies, parsed_content
 
 
+def get_state_keys_filled_by(parsed_page) -> set:
+    """
+    Get the site state keys a page adds itself to (i.e. `posts` for a page with the `post` layout).
+    """
+    state_keys = set()
+
+    if "layout" in parsed_page:
+        state_keys.add(parsed_page["layout"] + "s")
+
+    if "collection" in parsed_page:
+        state_keys.add(parsed_page["collection"].lower())
+
+    return state_keys
+
+
+def get_reverse_dependencies() -> dict:
+    """
+    Invert the dependency graph, so every file and state key maps to the files that depend on it.
+
+    A page that adds itself to a state key (i.e. a post to `site.posts`) is a dependency of that key,
+    so a change to the page reaches every template that reads the key.
+    """
+    reverse_dependencies = defaultdict(set)
+
+    for file, dependencies in all_dependencies.items():
+        for dependency in dependencies:
+            reverse_dependencies[dependency].add(file)
+
+        if file in all_parsed_pages:
+            for state_key in get_state_keys_filled_by(all_parsed_pages[file]):
+                reverse_dependencies[file].add(state_key)
+
+    for collection, files in collections_to_files.items():
+        for file in files:
+            reverse_dependencies[file].add(collection)
+
+    return reverse_dependencies
+
+
+def get_dependents(files: list) -> list:
+    """
+    Get the files, and every file that depends on them, directly or through other files.
+
+    Each file is looked up in the reverse dependency graph once.
+    """
+    dependents = []
+    seen = set()
+    queue = list(files)
+
+    while queue:
+        file = queue.pop()
+
+        if file in seen:
+            continue
+
+        seen.add(file)
+        dependents.append(file)
+        queue.extend(reverse_deps.get(file, ()))
+
+    return dependents
+
+
+def get_dependency_graph_size() -> dict:
+    """
+    Count the nodes and edges in the dependency graph.
+    """
+    nodes = set(all_dependencies)
+    edges = 0
+
+    for dependencies in all_dependencies.values():
+        nodes.update(dependencies)
+        edges += len(dependencies)
+
+    return {"nodes": len(nodes), "edges": edges}
+
+
+def copy_parsed_page(parsed_page):
+    """
+    Make a shallow copy of a parsed page whose front matter can be changed without changing the original.
+    """
+    page = copy(parsed_page)
+    page.metadata = dict(parsed_page.metadata)
+
+    return page
+
+
+def copy_front_matter(front_matter: dict) -> dict:
+    """
+    Copy front matter, and the dictionaries in it (i.e. `post`), which may be changed in place.
+    """
+    return {
+        key: copy(value) if isinstance(value, dict) else value
+        for key, value in front_matter.items()
+    }
+
+
+def get_changed_front_matter(before: dict, after: dict) -> dict:
+    """
+    Get the values in `after` that were added or changed since `before`, a copy made with
+    `copy_front_matter`.
+    """
+    return {
+        key: value
+        for key, value in after.items()
+        if key not in before
+        or (
+            before[key] != value
+            if isinstance(value, dict)
+            else before[key] is not value
+        )
+    }
+
+
+def get_archive_keys(metadata: dict) -> dict:
+    """
+    Get the dates, categories and tags of the archives a page is listed on.
+    """
+    date = metadata.get("date")
+
+    return {
+        "dates": [date] if isinstance(date, datetime.date) else [],
+        "categories": list(dict.fromkeys(metadata.get("categories") or [])),
+        "tags": list(dict.fromkeys(metadata.get("tags") or [])),
+    }
+
+
+def link_resident_neighbouring_pages(pages: list, changed_paths: set) -> list:
+    """
+    Link neighbouring pages while serving, where `pages` are the paths of the pages in
+    the order they are linked in.
+
+    Links are only made again for pages whose neighbours have moved, or are in
+    `changed_paths`. The links of other pages are the links kept from the last build.
+
+    Returns the pages whose links have changed since the last build.
+    """
+    parsed_pages = [all_page_contents[page] for page in pages]
+    neighbours = find_neighbouring_pages(
+        [resident_pages[page]["category_keys"] for page in pages]
+    )
+    relinked_pages = []
+
+    for page, parsed_page, page_neighbours in zip(pages, parsed_pages, neighbours):
+        resident_page = resident_pages[page]
+        neighbouring_paths = tuple(
+            pages[i] if i is not None else None for i in page_neighbours
+        )
+
+        if resident_page.get("neighbouring_paths") != neighbouring_paths or any(
+            path in changed_paths for path in neighbouring_paths
+        ):
+            links = get_neighbour_links(parsed_pages, page_neighbours)
+
+            if (
+                "neighbour_links" in resident_page
+                and links != resident_page["neighbour_links"]
+            ):
+                relinked_pages.append(page)
+
+            resident_page["neighbouring_paths"] = neighbouring_paths
+            resident_page["neighbour_links"] = links
+
+        parsed_page.metadata.update(resident_page["neighbour_links"])
+
+    return relinked_pages
+
+
 def make_any_nonexistent_directories(path: str) -> None:
     if not os.path.exists(path):
         os.makedirs(path)
 
 
+@functools.lru_cache(maxsize=FRONT_MATTER_CACHE_SIZE)
+def compile_front_matter_expression(expression: str):
+    """
+    Compile a front matter value with Jinja2.
+
+    Values such as `{{ page.title }} - {{ site.name }}` repeat across thousands of pages,
+    so compiled expressions are cached by their source.
+    """
+    return JINJA2_ENV.from_string(expression)
+
+
 def interpolate_front_matter(front_matter: dict, state: dict, runtime = None) -> dict:
     """Evaluate front matter with Jinja2 to allow logic in front matter."""
     # Keep track of already interpolated keys to prevent double interpolation
@@ -379,9 +813,9 @@ def interpolate_front_matter(front_matter: dict, state: dict, runtime = None) ->
             and key not in interpolated_keys  # Only interpolate if key hasn't been processed
         ):
             try:
-                front_matter[key] = JINJA2_ENV.from_string(front_matter[key]).render(
-                    page=front_matter.get("page", front_matter), site=state
-                )
+                front_matter[key] = compile_front_matter_expression(
+                    front_matter[key]
+                ).render(page=front_matter.get("page", front_matter), site=state)
                 interpolated_keys.add(key)  # Mark this key as interpolated
             except:
                 print(f"Error evaluating {front_matter[key]}. ERROR.")
@@ -390,114 +824,352 @@ def interpolate_front_matter(front_matter: dict, state: dict, runtime = None) ->
     return front_matter
 
 
+class CompiledLayout:
+    """
+    A layout whose template and front matter are prepared once per build.
+
+    Only the body of the layout is compiled, so rendering a page with the layout never
+    has to parse front matter out of the rendered output.
+    """
+
+    def __init__(self, layout_path: str):
+        parsed_layout = all_parsed_pages[layout_path]
+
+        self.path = layout_path
+        self.template = JINJA2_ENV.from_string(parsed_layout.content)
+        self.metadata = parsed_layout.metadata
+        self.parent = self.metadata.get("layout")
+
+
+def get_compiled_layout(layout_path: str) -> CompiledLayout:
+    """
+    Get the compiled version of a layout, compiling it on first use in a build.
+    """
+    if layout_path not in compiled_layouts:
+        compiled_layouts[layout_path] = CompiledLayout(layout_path)
+
+    return compiled_layouts[layout_path]
+
+
+def get_layout_chain(layout: str) -> list:
+    """
+    Get the compiled layouts that wrap a page that uses `layout`, innermost first.
+
+    Chains are cached for the duration of a build. A chain is never resolved past
+    INHERITANCE_LIMIT + 1 layouts, so layouts that inherit from themselves terminate.
+    """
+    if layout in layout_chains:
+        return layout_chains[layout]
+
+    chain = []
+    current_layout = layout
+
+    while current_layout and len(chain) <= INHERITANCE_LIMIT:
+        compiled_layout = get_compiled_layout(
+            f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{current_layout}.html"
+        )
+        chain.append(compiled_layout)
+        current_layout = compiled_layout.parent
+
+    layout_chains[layout] = chain
+
+    return chain
+
+
 def recursively_build_page_template_with_front_matter(
     file_name: str,
     front_matter: dict,
     state: dict,
     current_contents: str = "",
-    level: int = 0,
-    original_page: dict = None,
 ) -> str:
     """
-    Recursively build a page template with front matter.
+    Wrap the contents of a page in its layout, and in every layout that layout inherits from.
 
-    This function is called recursively until there is no layout key in the front matter.
+    Each level of the layout chain costs one template render. The metadata of each
+    level is a shallow copy of the layout's front matter, with `page` and `post` set
+    to the metadata of the level below.
     """
-    if level > 10:
+    if not front_matter or "layout" not in front_matter.metadata:
+        return current_contents
+
+    chain = get_layout_chain(front_matter.metadata["layout"])
+
+    if len(chain) > INHERITANCE_LIMIT:
         logging.critical(
             f"{file_name} has more than ten levels of recursion. Template will be marked as empty."
         )
         return ""
 
-    if front_matter and "layout" in front_matter.metadata:
-        layout = front_matter.metadata["layout"]
-        layout_path = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{layout}.html"
-
-        # Always use a deep copy of the current front matter for this recursion
-        current_page_metadata = deepcopy(front_matter.metadata)
+    current_page_metadata = dict(front_matter.metadata)
 
-        # Interpolate front matter before creating page object
+    for level, layout in enumerate(chain):
         current_page_metadata = interpolate_front_matter(current_page_metadata, state)
 
-        # Create page object with interpolated front matter
-        page_fm = type("Page", (object,), current_page_metadata)()
-
-        current_contents = loads(
-            all_opened_pages[layout_path].render(
-                page=page_fm,
+        with Span(build_profile, layout.path, "layout", page=file_name, level=level):
+            current_contents = layout.template.render(
+                page=Page(current_page_metadata),
                 site=state,
                 content=current_contents,
                 post=Post(current_page_metadata),
-            )
-        ).content
-
-        layout_front_matter = all_parsed_pages[layout_path]
+            ).strip()
 
-        # Pass the current page metadata for the next recursion
-        layout_front_matter["page"] = current_page_metadata
-        layout_front_matter["post"] = current_page_metadata
-
-        return recursively_build_page_template_with_front_matter(
-            file_name, layout_front_matter, state, current_contents.strip(), level + 1, current_page_metadata
-        )
+        current_page_metadata = {
+            **layout.metadata,
+            "page": current_page_metadata,
+            "post": current_page_metadata,
+        }
 
     return current_contents
 
 
-def render_page(file: str, skip_hooks=False) -> None:
+def _serialize_for_cache_key(value):
     """
-    Render a page with the Aurora static site generator.
+    Serialize values orjson does not support natively when computing a render cache key.
     """
+    if hasattr(value, "metadata") and hasattr(value, "content"):
+        return {
+            "metadata": {
+                k: v for k, v in value.metadata.items() if k != "generated_on"
+            },
+            "content": value.content,
+        }
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, StreamedCollection):
+        return value.fingerprint()
+    if hasattr(value, "__dict__"):
+        return {k: v for k, v in vars(value).items() if k != "generated_on"}
 
-    original_file = file
+    return str(value)
 
-    # # skip if json
-    if file.endswith(".json"):
-        return
 
-    try:
-        contents = all_opened_pages[file]
-    except Exception as e:
-        print(f"Error reading {file}")
-        # raise e
-        return
+def get_template_digest(file_name: str) -> tuple:
+    """
+    Get a digest of a template, its layouts and includes, and the `site.*` keys they read.
 
-    page_state = state.copy()
+    The keys are None if the template, or one of its layouts or includes, reads `site` as a
+    whole (i.e. `site["posts"]`), in which case any value in the site state may change it.
+    """
+    if file_name in template_digests:
+        return template_digests[file_name]
 
-    has_user_assigned_permalink = False
+    # guards against templates that include each other
+    template_digests[file_name] = ("", frozenset())
 
-    if all_parsed_pages[file].get("skip"):
-        return
+    # the dependencies of unchanged pages are kept from the last incremental build, so their
+    # templates may not have been parsed in this build
+    if file_name in all_dependencies and file_name not in templates_reading_site:
+        get_template_dependencies(file_name)
 
-    slug = file.split("/")[-1].replace(".html", "")
+    digest = hashlib.sha1(source_digests.get(file_name, "").encode())
+    state_keys = set()
+    reads_site = templates_reading_site.get(file_name, False)
 
-    slug = slug.replace("posts/", "")
+    for dependency in sorted(all_dependencies.get(file_name, ())):
+        if dependency in state:
+            state_keys.add(dependency)
+            continue
 
-    has_user_assigned_permalink = all_parsed_pages[file].metadata.get(
-        "has_user_assigned_permalink"
+        dependency_digest, dependency_state_keys = get_template_digest(dependency)
+        digest.update(f"{dependency}:{dependency_digest}".encode())
+
+        if dependency_state_keys is None:
+            reads_site = True
+        else:
+            state_keys.update(dependency_state_keys)
+
+    template_digests[file_name] = (
+        digest.hexdigest(),
+        None if reads_site else frozenset(state_keys),
     )
 
-    page_state["page"] = all_parsed_pages[file].metadata
-    page_state["post"] = all_parsed_pages[file].metadata
-    
-    if not page_state["page"].get("permalink"):
-        page_state["page"]["permalink"] = page_state.get("permalink", slug)  # .strip("/")
+    return template_digests[file_name]
 
-    page_state["page"]["generated_on"] = datetime.datetime.now()
 
-    if slug[0].isdigit():
-        date_slug = re.search(r"\d{4}-\d{2}-\d{2}", slug)
-        if date_slug:
-            date_slug = date_slug.group(0)
-            page_state["post"]["date"] = datetime.datetime.strptime(
-                date_slug, "%Y-%m-%d"
-            )
-            if page_state["post"].get("hms") and page_state["post"]["hms"].count(":") == 2:
-                page_state["post"]["date"] = page_state["post"]["date"].replace(
-                    hour=int(page_state["post"]["hms"].split(":")[0]),
-                    minute=int(page_state["post"]["hms"].split(":")[1]),
-                    second=int(page_state["post"]["hms"].split(":")[2]),
-                )
+def get_render_cache_key(file: str, page_state: dict, skip_hooks: bool):
+    """
+    Get the render cache key of a page, or None if the page cannot be cached.
+
+    The key covers the page source, the sources of its layouts and includes, its front matter,
+    values added by hooks, the source of the hook modules, and the values of every `site.*`
+    key the page and its templates read. Pages whose templates read `site` as a whole are
+    not cached.
+    """
+    template_digest, state_keys = get_template_digest(file)
+
+    if state_keys is None:
+        return None
+
+    metadata = {
+        k: v for k, v in all_parsed_pages[file].metadata.items() if k != "generated_on"
+    }
+    page_values = {
+        k: v
+        for k, v in page_state.items()
+        if k not in ("page", "post") and (k not in state or v is not state[k])
+    }
+
+    try:
+        serialized = orjson.dumps(
+            [
+                __version__,
+                BASE_URL,
+                repr(HOOKS),
+                HOOK_SOURCE_DIGEST,
+                skip_hooks,
+                template_digest,
+                metadata,
+                page_values,
+                {key: state[key] for key in sorted(state_keys) if key in state},
+            ],
+            default=_serialize_for_cache_key,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+    except orjson.JSONEncodeError:
+        return None
+
+    return hashlib.sha1(serialized).hexdigest()
+
+
+def get_layout_digest(layout_path: str):
+    """
+    Get a digest of a layout, its layouts and includes, and the values of the `site.*` keys they read.
+
+    Digests are computed once per build. Returns None if the digest cannot be computed.
+    """
+    if layout_path in layout_digests:
+        return layout_digests[layout_path]
+
+    template_digest, state_keys = get_template_digest(layout_path)
+
+    if state_keys is None:
+        layout_digests[layout_path] = None
+        return None
+
+    try:
+        serialized = orjson.dumps(
+            [
+                __version__,
+                BASE_URL,
+                template_digest,
+                {key: state[key] for key in sorted(state_keys) if key in state},
+            ],
+            default=_serialize_for_cache_key,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+        layout_digests[layout_path] = hashlib.sha1(serialized).hexdigest()
+    except orjson.JSONEncodeError:
+        layout_digests[layout_path] = None
+
+    return layout_digests[layout_path]
+
+
+def get_item_digest(parsed_page):
+    """
+    Get a digest of the front matter of a post or collection item listed on a generated page.
+
+    Digests are computed once per build. Returns None if the digest cannot be computed.
+    """
+    item = id(parsed_page)
+
+    if item in item_digests:
+        return item_digests[item]
+
+    metadata = {k: v for k, v in parsed_page.metadata.items() if k != "generated_on"}
+
+    try:
+        item_digests[item] = hashlib.sha1(
+            orjson.dumps(
+                metadata,
+                default=_serialize_for_cache_key,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            )
+        ).hexdigest()
+    except orjson.JSONEncodeError:
+        item_digests[item] = None
+
+    return item_digests[item]
+
+
+def get_generated_page_fingerprint(layout_path: str, page_values: list, items: list):
+    """
+    Fingerprint a generated page, such as a date archive, from its layout, the values that
+    identify the page, and the parsed pages it lists.
+
+    Returns None if the page cannot be fingerprinted, in which case it is always generated.
+    """
+    layout_digest = get_layout_digest(layout_path)
+    digests = [get_item_digest(item) for item in items]
+
+    if layout_digest is None or None in digests:
+        return None
+
+    fingerprint = hashlib.sha1(layout_digest.encode())
+    fingerprint.update(orjson.dumps(page_values, default=str))
+
+    for digest in digests:
+        fingerprint.update(digest.encode())
+
+    return fingerprint.hexdigest()
+
+
+def render_page(file: str, skip_hooks=False):
+    """
+    Render a page with the Aurora static site generator.
+
+    Returns a tuple of the path to which the page should be saved and the rendered page,
+    or None if the page was not rendered.
+    """
+
+    original_file = file
+
+    # # skip if json
+    if file.endswith(".json"):
+        return
+
+    try:
+        contents = all_opened_pages[file]
+    except Exception as e:
+        print(f"Error reading {file}")
+        # raise e
+        return
+
+    page_state = state.copy()
+
+    has_user_assigned_permalink = False
+
+    if all_parsed_pages[file].get("skip"):
+        return
+
+    slug = file.split("/")[-1].replace(".html", "")
+
+    slug = slug.replace("posts/", "")
+
+    has_user_assigned_permalink = all_parsed_pages[file].metadata.get(
+        "has_user_assigned_permalink"
+    )
+
+    page_state["page"] = all_parsed_pages[file].metadata
+    page_state["post"] = all_parsed_pages[file].metadata
+    
+    if not page_state["page"].get("permalink"):
+        page_state["page"]["permalink"] = page_state.get("permalink", slug)  # .strip("/")
+
+    page_state["page"]["generated_on"] = datetime.datetime.now()
+
+    if slug[0].isdigit():
+        date_slug = re.search(r"\d{4}-\d{2}-\d{2}", slug)
+        if date_slug:
+            date_slug = date_slug.group(0)
+            page_state["post"]["date"] = datetime.datetime.strptime(
+                date_slug, "%Y-%m-%d"
+            )
+            if page_state["post"].get("hms") and page_state["post"]["hms"].count(":") == 2:
+                page_state["post"]["date"] = page_state["post"]["date"].replace(
+                    hour=int(page_state["post"]["hms"].split(":")[0]),
+                    minute=int(page_state["post"]["hms"].split(":")[1]),
+                    second=int(page_state["post"]["hms"].split(":")[2]),
+                )
             page_state["post"]["full_date"] = page_state["post"]["date"].strftime(
                 "%B %d, %Y"
             )
@@ -538,30 +1210,59 @@ def render_page(file: str, skip_hooks=False) -> None:
 
     for hook, hooks in EVALUATED_REGISTERED_TEMPLATE_GENERATION_HOOKS.items():
         for hook in hooks:
-            page_state = hook(file, page_state, state)
+            with Phase(
+                build_profile,
+                get_hook_name("pre_template_generation", hook),
+                items=1,
+                category="hook",
+            ):
+                page_state = hook(file, page_state, state)
 
-    try:
-        if file.endswith(".md"):
-            contents = md.html(loads(all_opened_pages[file]).content)
-        elif isinstance(contents, str):
-            # this happens for data files only, where content does not exist
-            contents = ""
-        else:
-            contents = loads(contents.render(page=page_state, site=state)).content
-    except Exception as e:
-        # print(f"Error rendering {file}")
-        return
+    cache_key = None
+    cached_page = None
 
-    page_state["page"].template = file
+    if render_cache:
+        cache_key = get_render_cache_key(file, page_state, skip_hooks)
+        if cache_key:
+            cached_page = render_cache.get(cache_key)
 
-    rendered = recursively_build_page_template_with_front_matter(
-        file, all_parsed_pages[file], page_state, contents
-    )
+    if cached_page:
+        contents = cached_page["contents"]
+        rendered = cached_page["rendered"]
+        page_state["page"].template = file
+    else:
+        try:
+            if file.endswith(".md"):
+                contents = md.html(loads(all_opened_pages[file]).content)
+            elif isinstance(contents, str):
+                # this happens for data files only, where content does not exist
+                contents = ""
+            else:
+                contents = loads(contents.render(page=page_state, site=state)).content
+        except Exception as e:
+            # print(f"Error rendering {file}")
+            return
+
+        page_state["page"].template = file
+
+        rendered = recursively_build_page_template_with_front_matter(
+            file, all_parsed_pages[file], page_state, contents
+        )
 
+        if cache_key:
+            render_cache.set(cache_key, {"contents": contents, "rendered": rendered})
+
+    # pages are cached before these hooks run, so hooks with side effects run for every page
     if not skip_hooks:
         for _, hooks in EVALUATED_POST_TEMPLATE_GENERATION_HOOKS.items():
             for hook in hooks:
-                rendered = hook(file, page_state, state, rendered)
+                with Phase(
+                    build_profile,
+                    get_hook_name("post_template_generation", hook),
+                    items=1,
+                    category="hook",
+                ):
+                    rendered = hook(file, page_state, state, rendered)
 
     file = file.replace(ROOT_DIR + "/", "")
 
@@ -575,13 +1276,7 @@ def render_page(file: str, skip_hooks=False) -> None:
 
     # if permalink is _site/templates/index.html, make it _site/index.html
     if file == "templates/index.html":
-        path = os.path.join(SITE_DIR, "index.html")
-        if os.path.exists(path):
-            os.remove(path)
-        with open(path, "w") as f:
-            f.write(rendered)
-
-        return
+        return os.path.join(SITE_DIR, "index.html"), rendered
 
     if file.startswith("templates/") and any(
         file.endswith(ext) for ext in [".html", ".md"]
@@ -632,52 +1327,321 @@ def render_page(file: str, skip_hooks=False) -> None:
 
     permalink = os.path.join(SITE_DIR, permalink)
 
-    if permalink.endswith(".html"):
-        make_any_nonexistent_directories(os.path.dirname(permalink))
-    else:
-        make_any_nonexistent_directories(os.path.join(SITE_DIR))
-
-    state_to_write[permalink] = rendered
     original_file_to_permalink[permalink] = original_file
 
+    return permalink, rendered
 
-def generate_date_page_given_year_month_date(
-    ymd_slug, posts, current_date_of_archive, granularity
+
+def render_traced_page(file: str, skip_hooks=False):
+    """
+    Render a page with `render_page`, recording how long it took as a span in the build's trace.
+    """
+    with Span(build_profile, file, "page"):
+        return render_page(file, skip_hooks=skip_hooks)
+
+
+def _record_worker_profile(render, *args) -> tuple:
+    """
+    Call `render` in a worker process with a profile of its own, so the phases and spans it
+    records can be sent back to the parent process and added to the build's profile.
+
+    Returns the result of `render` and the profile, which is None if the build is not profiled.
+    """
+    global build_profile
+
+    parent_profile = build_profile
+
+    if parent_profile:
+        build_profile = BuildProfile(trace=Trace() if parent_profile.trace else None)
+
+    try:
+        return render(*args), build_profile
+    finally:
+        build_profile = parent_profile
+
+
+def _render_page_in_worker(file: str, skip_hooks: bool) -> tuple:
+    """
+    Render a page in a worker process and return everything the parent process needs to merge.
+
+    The worker was forked from the parent, so it starts with the parent's globals.
+    Only the output of this page is returned; the parent decides whether it is kept.
+    """
+    original_file_to_permalink.clear()
+    permalinks.clear()
+    saved_pages.clear()
+    pages_before = len(state["pages"])
+
+    metadata = all_parsed_pages[file].metadata if file in all_parsed_pages else {}
+    metadata_before = dict(metadata)
+
+    cache_hits, cache_misses = (
+        (render_cache.hits, render_cache.misses) if render_cache else (0, 0)
+    )
+    front_matter_cache_info = compile_front_matter_expression.cache_info()
+
+    output, page_profile = _record_worker_profile(render_traced_page, file, skip_hooks)
+
+    rendered_pages = state["pages"][pages_before:]
+    del state["pages"][pages_before:]
+
+    changed_metadata = {
+        key: value
+        for key, value in metadata.items()
+        if key not in metadata_before or metadata_before[key] is not value
+    }
+
+    if render_cache:
+        cache_hits = render_cache.hits - cache_hits
+        cache_misses = render_cache.misses - cache_misses
+
+    front_matter_cache_hits = (
+        compile_front_matter_expression.cache_info().hits - front_matter_cache_info.hits
+    )
+    front_matter_cache_misses = (
+        compile_front_matter_expression.cache_info().misses
+        - front_matter_cache_info.misses
+    )
+
+    return (
+        output,
+        dict(original_file_to_permalink),
+        dict(permalinks),
+        rendered_pages,
+        changed_metadata,
+        (cache_hits, cache_misses),
+        (front_matter_cache_hits, front_matter_cache_misses),
+        page_profile,
+    )
+
+
+def _render_data_record_in_worker(
+    file: str, contents: str, parsed_page, skip_hooks: bool
+) -> tuple:
+    """
+    Render the page for a record of a streamed data file in a worker process.
+
+    Workers are reused for every chunk of records, so the record is passed in rather than
+    read from the globals the worker was forked with. It is removed again once rendered.
+    """
+    all_opened_pages[file] = contents
+    all_page_contents[file] = parsed_page
+    all_parsed_pages[file] = parsed_page
+
+    try:
+        return _render_page_in_worker(file, skip_hooks)
+    finally:
+        all_opened_pages.pop(file, None)
+        all_page_contents.pop(file, None)
+        all_parsed_pages.pop(file, None)
+        template_digests.pop(file, None)
+
+
+def _merge_rendered_page(file: str, result: tuple):
+    """
+    Merge the output of `_render_page_in_worker` into the global build state.
+
+    Returns the rendered page, as returned by `render_page`.
+    """
+    (
+        output,
+        written_from,
+        page_permalinks,
+        rendered_pages,
+        changed_metadata,
+        (cache_hits, cache_misses),
+        (front_matter_cache_hits, front_matter_cache_misses),
+        page_profile,
+    ) = result
+
+    original_file_to_permalink.update(written_from)
+
+    for permalink, files in page_permalinks.items():
+        permalinks[permalink].extend(files)
+
+    for page in rendered_pages:
+        if page["url"] not in saved_pages:
+            state["pages"].append(page)
+            saved_pages.add(page["url"])
+
+    if changed_metadata:
+        all_parsed_pages[file].metadata.update(changed_metadata)
+
+    if render_cache:
+        render_cache.hits += cache_hits
+        render_cache.misses += cache_misses
+
+    worker_front_matter_cache_stats["hits"] += front_matter_cache_hits
+    worker_front_matter_cache_stats["misses"] += front_matter_cache_misses
+
+    if build_profile:
+        build_profile.merge(page_profile)
+
+    return output
+
+
+def reads_state_filled_during_rendering(file: str, invariant_state_keys: set) -> bool:
+    """
+    Check whether a page reads site state that other pages change while they render (i.e. `site.pages`).
+    """
+    return any(
+        dependency in state and dependency not in invariant_state_keys
+        for dependency in all_dependencies.get(file, ())
+    )
+
+
+def render_pages_in_parallel(
+    files: list,
+    jobs: int,
+    save_page,
+    skip_hooks: bool = False,
+    show_progress: bool = True,
 ) -> None:
-    ymd_path = os.path.join(SITE_DIR, ymd_slug)
+    """
+    Render pages over a pool of `jobs` worker processes.
 
-    make_any_nonexistent_directories(ymd_path)
+    Files are taken in toposorted order. Consecutive pages that only read their own front matter,
+    templates and fixed site state are rendered at the same time. A page that reads state other
+    pages fill in while rendering (`site.pages`, `site.posts`, collections) waits until every page
+    before it has been merged, then renders in this process, so the output matches a serial build.
 
-    date_archive_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/date.html"
+    Every rendered page is passed to `save_page`, in order, along with the file it was rendered from.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print(
+            "Parallel rendering is not supported on this platform. Rendering serially."
+        )
+        for file in tqdm.tqdm(files, disable=not show_progress):
+            save_page(file, render_traced_page(file, skip_hooks=skip_hooks))
+        return
+
+    invariant_state_keys = {
+        "root_url",
+        "build_date",
+        "build_timestamp",
+        "environment",
+    }
+    invariant_state_keys.update(SITE_STATE)
+    invariant_state_keys.update(
+        os.path.splitext(data_file)[0]
+        for data_file in itertools.chain(all_data_files, streamed_data_files)
+    )
+
+    progress = tqdm.tqdm(total=len(files), disable=not show_progress)
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+
+        def render_batch(batch: list) -> None:
+            chunksize = max(1, len(batch) // (jobs * 4))
+            results = pool.map(
+                _render_page_in_worker,
+                batch,
+                itertools.repeat(skip_hooks),
+                chunksize=chunksize,
+            )
+            for file, result in zip(batch, results):
+                save_page(file, _merge_rendered_page(file, result))
+                progress.update(1)
+
+        batch = []
+
+        for file in files:
+            if reads_state_filled_during_rendering(file, invariant_state_keys):
+                render_batch(batch)
+                batch = []
+                save_page(file, render_traced_page(file, skip_hooks=skip_hooks))
+                progress.update(1)
+            else:
+                batch.append(file)
+
+        render_batch(batch)
+
+    progress.close()
+
+
+def can_use_worker_processes(jobs: int) -> bool:
+    return jobs > 1 and "fork" in multiprocessing.get_all_start_methods()
+
+
+def create_worker_pool(jobs: int) -> ProcessPoolExecutor:
+    """
+    Create a pool of `jobs` worker processes, which are forked from this process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+    )
+
+
+def render_in_worker_processes(
+    render, arguments: list, jobs: int, pool: ProcessPoolExecutor = None
+):
+    """
+    Call `render` with each tuple in `arguments` over a pool of `jobs` worker processes.
+
+    Results are yielded in the same order as `arguments`. Workers are forked, so `render`
+    can read any global state set up before this is called. If `jobs` is 1, or forking
+    is not supported, everything is rendered in this process.
+
+    If `pool` is given, its workers are used instead of forking new ones. They only see
+    the global state set up before they were forked, so everything else `render` needs
+    must be passed in `arguments`.
+    """
+    if not can_use_worker_processes(jobs) or (pool is None and len(arguments) < 2):
+        for args in arguments:
+            yield render(*args)
+        return
+
+    if pool is None:
+        with create_worker_pool(jobs) as pool:
+            yield from render_in_worker_processes(render, arguments, jobs, pool)
 
-    if not all_opened_pages.get(date_archive_layout):
         return
 
-    date_archive_contents = all_opened_pages[date_archive_layout]
+    for result, profile in pool.map(
+        functools.partial(_record_worker_profile, render),
+        *zip(*arguments),
+        chunksize=max(1, len(arguments) // (jobs * 4)),
+    ):
+        if build_profile:
+            build_profile.merge(profile)
+
+        yield result
+
+
+def generate_date_page_given_year_month_date(
+    ymd_slug, posts, current_date_of_archive, granularity
+) -> tuple:
+    """
+    Render a date archive page for `posts`, which must already be sorted newest first.
+
+    Returns the path of the archive page and its contents.
+    """
+    ymd_path = os.path.join(SITE_DIR, ymd_slug)
+
+    date_archive_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/date.html"
 
     date_archive_state = state.copy()
     date_archive_state["date"] = current_date_of_archive
 
-    page = deepcopy(all_parsed_pages[date_archive_layout])
+    page = copy_parsed_page(all_parsed_pages[date_archive_layout])
     page["date"] = current_date_of_archive
     date_archive_state["date_type"] = granularity
 
     date_archive_state["posts"] = [all_parsed_pages[post].metadata for post in posts]
 
-    # order by date
-    date_archive_state["posts"] = sorted(
-        date_archive_state["posts"],
-        key=lambda x: x["date"],
-        reverse=True,
-    )
-
     fm = interpolate_front_matter(page, date_archive_state)
 
-    rendered_page = date_archive_contents.render(
-        date_archive_state,
-        site=state,
-        posts=date_archive_state["posts"],
-        page=date_archive_state,
+    rendered_page = (
+        get_compiled_layout(date_archive_layout)
+        .template.render(
+            date_archive_state,
+            site=state,
+            posts=date_archive_state["posts"],
+            page=date_archive_state,
+        )
+        .strip()
     )
 
     if not date_archive_state.get("page"):
@@ -686,123 +1650,167 @@ def generate_date_page_given_year_month_date(
     date_archive_state["page"]["template"] = date_archive_layout
 
     rendered_page = recursively_build_page_template_with_front_matter(
-        ymd_path, fm, date_archive_state, loads(rendered_page).content
+        ymd_path, fm, date_archive_state, rendered_page
     )
 
-    with open(
-        os.path.join(ymd_path, "index.html"),
-        "wb",
-        buffering=500,
-    ) as f:
-        f.write(rendered_page.encode())
+    return os.path.join(ymd_path, "index.html"), rendered_page
 
 
-def generate_paginated_page_for_collection(
-    collection: str, per_page: int, template: str
-) -> None:
+def get_sorted_collection(collection: str) -> list:
     """
-    Generate paginated pages for a collection.
-    """
-
-    if not state.get(collection):
-        return
-
-    print(f"Generating paginated pages for {collection}")
+    Get the items in a collection, newest first, or by title if not every item has a date.
 
-    collection = state[collection]
+    Each collection is sorted once per build.
+    """
+    if collection in sorted_collections:
+        return sorted_collections[collection]
 
-    if not collection:
-        return
+    items = state[collection]
 
-    all_keys_contain_dates = all(i.metadata.get("date") for i in collection)
+    all_keys_contain_dates = all(i.metadata.get("date") for i in items)
 
     # if all keys have dates
     if all_keys_contain_dates:
-        collection = sorted(
-            collection, key=lambda x: x.metadata.get("date"), reverse=True
-        )
+        items = sorted(items, key=lambda x: x.metadata.get("date"), reverse=True)
     else:
-        collection = sorted(
-            collection, key=lambda x: x.metadata.get("title"), reverse=True
-        )
+        items = sorted(items, key=lambda x: x.metadata.get("title"), reverse=True)
 
-    for i in tqdm.tqdm(range(0, len(collection), per_page)):
-        page = i // per_page + 1
-        paginated_collection = collection[i : i + per_page]
+    sorted_collections[collection] = items
 
-        print(f"Generating paginated page {page} for {collection}")
+    return items
 
-        if page == 1:
-            paginated_collection_path = os.path.join(SITE_DIR, f"{template}/index.html")
-        else:
-            paginated_collection_path = os.path.join(
-                SITE_DIR, f"{template}/{page}/index.html"
-            )
 
-        make_any_nonexistent_directories(os.path.dirname(paginated_collection_path))
+def get_paginated_page_path(template: str, page: int) -> str:
+    if page == 1:
+        return os.path.join(SITE_DIR, f"{template}/index.html")
+
+    return os.path.join(SITE_DIR, f"{template}/{page}/index.html")
+
+
+def generate_paginated_page(
+    collection_name: str, per_page: int, template: str, page_number: int
+) -> tuple:
+    """
+    Render one page of a paginated collection.
+
+    Returns the path of the page and its contents.
+    """
+    collection = get_sorted_collection(collection_name)
+    paginated_collection = collection[
+        (page_number - 1) * per_page : page_number * per_page
+    ]
 
-        paginated_collection_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{template}.html"
+    print(f"Generating paginated page {page_number} for {collection_name}")
 
-        paginated_collection_contents = all_opened_pages[paginated_collection_layout]
+    paginated_collection_path = get_paginated_page_path(template, page_number)
 
-        paginated_collection_state = state.copy()
-        paginated_collection_state[collection[0]["layout"]] = paginated_collection
-        paginated_collection_state["current_page"] = paginated_collection
-        paginated_collection_state["page_number"] = page
+    paginated_collection_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{template}.html"
 
-        page = deepcopy(all_parsed_pages[paginated_collection_layout])
-        page[collection[0]["layout"]] = paginated_collection
+    paginated_collection_state = state.copy()
+    paginated_collection_state[collection[0]["layout"]] = paginated_collection
+    paginated_collection_state["current_page"] = paginated_collection
+    paginated_collection_state["page_number"] = page_number
 
-        fm = interpolate_front_matter(page, paginated_collection_state)
+    page = copy_parsed_page(all_parsed_pages[paginated_collection_layout])
+    page[collection[0]["layout"]] = paginated_collection
 
-        rendered_page = paginated_collection_contents.render(
+    fm = interpolate_front_matter(page, paginated_collection_state)
+
+    rendered_page = (
+        get_compiled_layout(paginated_collection_layout)
+        .template.render(
             paginated_collection_state,
             site=state,
             posts=paginated_collection,
             page=paginated_collection_state,
         )
+        .strip()
+    )
 
-        if not paginated_collection_state.get("page"):
-            paginated_collection_state["page"] = {}
+    if not paginated_collection_state.get("page"):
+        paginated_collection_state["page"] = {}
 
-        paginated_collection_state["page"]["template"] = paginated_collection_layout
+    paginated_collection_state["page"]["template"] = paginated_collection_layout
 
-        rendered_page = recursively_build_page_template_with_front_matter(
-            paginated_collection_path,
-            fm,
-            paginated_collection_state,
-            loads(rendered_page).content,
-        )
+    rendered_page = recursively_build_page_template_with_front_matter(
+        paginated_collection_path,
+        fm,
+        paginated_collection_state,
+        rendered_page,
+    )
 
-        with open(
-            paginated_collection_path,
-            "wb",
-            buffering=500,
-        ) as f:
-            f.write(rendered_page.encode())
+    return paginated_collection_path, rendered_page
 
 
-def process_date_archives() -> None:
+def generate_paginated_page_for_collection(
+    collection: str,
+    per_page: int,
+    template: str,
+    previous_fingerprints: dict = None,
+    jobs: int = 1,
+) -> dict:
     """
-    Generate date archives for all posts.
+    Generate paginated pages for a collection.
 
-    For example, if there are posts on 2022-01-01 and 2022-01-02, generate:
+    If `previous_fingerprints` is given, pages that list the same items as in the last
+    build, and which still exist, are not generated again.
 
-    - /2022/index.html
-    - /2022/01/index.html
-    - /2022/01/01/index.html
+    Returns the fingerprint of every page, keyed by its path in the site directory.
     """
 
-    posts = [
-        key
-        for key in all_opened_pages.keys()
-        if key.startswith(os.path.join(ROOT_DIR, "posts"))
-    ]
+    if not state.get(collection):
+        return {}
+
+    print(f"Generating paginated pages for {collection}")
+
+    items = get_sorted_collection(collection)
+    paginated_collection_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{template}.html"
+
+    fingerprints = {}
+    pages_to_generate = []
+
+    for page in range(1, (len(items) + per_page - 1) // per_page + 1):
+        paginated_collection_path = get_paginated_page_path(template, page)
+
+        if previous_fingerprints is not None:
+            key = os.path.relpath(paginated_collection_path, SITE_DIR)
+            fingerprints[key] = get_generated_page_fingerprint(
+                paginated_collection_layout,
+                [collection, template, page],
+                items[(page - 1) * per_page : page * per_page],
+            )
+
+            if (
+                fingerprints[key]
+                and fingerprints[key] == previous_fingerprints.get(key)
+                and os.path.exists(paginated_collection_path)
+            ):
+                site_writer.keep(paginated_collection_path)
+                continue
+
+        pages_to_generate.append((collection, per_page, template, page))
 
-    dates = set()
+    for paginated_collection_path, rendered_page in tqdm.tqdm(
+        render_in_worker_processes(generate_paginated_page, pages_to_generate, jobs),
+        total=len(pages_to_generate),
+    ):
+        site_writer.write(paginated_collection_path, rendered_page)
+
+    return fingerprints
+
+
+def get_date_archive_tree() -> dict:
+    """
+    Group all dated posts by year, month and day.
+
+    Returns a dictionary in the form `years[year][month][day] = [post, ...]`.
+    """
     years = {}
 
-    for post in posts:
+    for post in all_opened_pages.keys():
+        if not post.startswith(os.path.join(ROOT_DIR, "posts")):
+            continue
+
         if not hasattr(all_parsed_pages[post], "metadata"):
             continue
 
@@ -810,250 +1818,548 @@ def process_date_archives() -> None:
             continue
 
         date = all_parsed_pages[post].metadata["date"]
-        dates.add(date)
-        if date.year not in years:
-            years[date.year] = {}
-        if date.month not in years[date.year]:
-            years[date.year][date.month] = {}
-        if date.day not in years[date.year][date.month]:
-            years[date.year][date.month][date.day] = []
-        years[date.year][date.month][date.day].append(post)
-
-    for year in years:
-        make_any_nonexistent_directories(os.path.join(SITE_DIR, str(year)))
-
-        for month in years[year]:
-            make_any_nonexistent_directories(
-                os.path.join(SITE_DIR, str(year), str(month))
-            )
+        years.setdefault(date.year, {}).setdefault(date.month, {}).setdefault(
+            date.day, []
+        ).append(post)
 
-            for day in years[year][month]:
-                ymd_slug = f"{year}/{str(month).zfill(2)}/{str(day).zfill(2)}"
+    return years
 
-                generate_date_page_given_year_month_date(
-                    ymd_slug,
-                    years[year][month][day],
-                    datetime.datetime(year, month, day),
-                    "day",
-                )
 
-            all_posts_in_month = [
-                post for day in years[year][month] for post in years[year][month][day]
-            ]
+def get_date_archives(date) -> tuple:
+    """
+    Get the slug, date and granularity of the day, month and year archives of a date.
+    """
+    return (
+        (
+            f"{date.year}/{str(date.month).zfill(2)}/{str(date.day).zfill(2)}",
+            datetime.datetime(date.year, date.month, date.day),
+            "day",
+        ),
+        (
+            f"{date.year}/{str(date.month).zfill(2)}",
+            datetime.datetime(date.year, date.month, 1),
+            "month",
+        ),
+        (str(date.year), datetime.datetime(date.year, 1, 1), "year"),
+    )
+
+
+def process_date_archives(
+    previous_fingerprints: dict = None, jobs: int = 1, dates: set = None
+) -> dict:
+    """
+    Generate date archives for all posts.
+
+    For example, if there are posts on 2022-01-01 and 2022-01-02, generate:
+
+    - /2022/index.html
+    - /2022/01/index.html
+    - /2022/01/01/index.html
+
+    If `previous_fingerprints` is given, archive pages whose fingerprint has not changed
+    since the last build, and which still exist, are not generated again. If `dates` is
+    also given, only the archives that list those dates are considered, and the
+    fingerprints of the other archives are kept from the last build.
+
+    Returns the fingerprint of every archive page.
+    """
+    date_archive_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/date.html"
+
+    if not all_opened_pages.get(date_archive_layout):
+        return {}
+
+    years = state["years"]
+    slugs = None
 
-            generate_date_page_given_year_month_date(
-                f"{year}/{str(month).zfill(2)}",
-                all_posts_in_month,
-                datetime.datetime(year, month, 1),
-                "month",
+    if previous_fingerprints is not None and dates is not None:
+        slugs = {slug for date in dates for slug, _, _ in get_date_archives(date)}
+        years = {year: years[year] for year in years if str(year) in slugs}
+
+    dated_posts = [
+        post
+        for months in years.values()
+        for days in months.values()
+        for posts in days.values()
+        for post in posts
+    ]
+
+    # sorting once keeps the posts on every archive page in order, newest first
+    archives = {}
+
+    for post in sorted(
+        dated_posts,
+        key=lambda post: all_parsed_pages[post].metadata["date"],
+        reverse=True,
+    ):
+        date = all_parsed_pages[post].metadata["date"]
+
+        for ymd_slug, current_date_of_archive, granularity in get_date_archives(date):
+            if slugs is not None and ymd_slug not in slugs:
+                continue
+
+            if ymd_slug not in archives:
+                archives[ymd_slug] = (current_date_of_archive, granularity, [])
+
+            archives[ymd_slug][2].append(post)
+
+    fingerprints = {}
+    archives_to_generate = []
+
+    if slugs is not None:
+        fingerprints = {
+            ymd_slug: fingerprint
+            for ymd_slug, fingerprint in previous_fingerprints.items()
+            if ymd_slug not in slugs
+        }
+
+    for ymd_slug, (current_date_of_archive, granularity, posts) in archives.items():
+        if previous_fingerprints is not None:
+            fingerprints[ymd_slug] = get_generated_page_fingerprint(
+                date_archive_layout,
+                [ymd_slug, granularity],
+                [all_parsed_pages[post] for post in posts],
             )
 
-        all_posts_in_year = [
-            post
-            for month in years[year]
-            for day in years[year][month]
-            for post in years[year][month][day]
-        ]
+            if (
+                fingerprints[ymd_slug]
+                and fingerprints[ymd_slug] == previous_fingerprints.get(ymd_slug)
+                and os.path.exists(os.path.join(SITE_DIR, ymd_slug, "index.html"))
+            ):
+                site_writer.keep(os.path.join(SITE_DIR, ymd_slug, "index.html"))
+                continue
 
-        generate_date_page_given_year_month_date(
-            str(year), all_posts_in_year, datetime.datetime(year, 1, 1), "year"
+        archives_to_generate.append(
+            (ymd_slug, posts, current_date_of_archive, granularity)
         )
 
-        print(f"Generated date archives for {year}")
+    for path, rendered_page in render_in_worker_processes(
+        generate_date_page_given_year_month_date, archives_to_generate, jobs
+    ):
+        site_writer.write(path, rendered_page)
 
-    state["years"] = years
+    print(
+        f"Generated {len(archives_to_generate)} date archives "
+        f"({len(archives) - len(archives_to_generate)} unchanged)."
+    )
+
+    return fingerprints
 
 
-def process_archives(name: str, state_key_associated_with_name: str, path: str):
+def get_archive_index(state_key_associated_with_name: str) -> dict:
+    """
+    Map each category (or tag) to the posts that have it, in one pass over all posts.
+
+    Posts are listed in the same order as `state["posts"]`.
+    """
+    index = {}
+
+    for post in state["posts"]:
+        if not post.get(state_key_associated_with_name):
+            continue
+
+        for category in dict.fromkeys(post[state_key_associated_with_name]):
+            index.setdefault(category, []).append(post)
+
+    return index
+
+
+def generate_archive_page(name: str, category: str, path: str) -> tuple:
+    """
+    Render the archive page for one category (or tag).
+
+    Returns the path of the archive page and its contents.
+    """
+    archive_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{name}.html"
+
+    archive_state = state.copy()
+    archive_state[name] = category
+    page = copy_parsed_page(all_parsed_pages[archive_layout])
+    page[name] = category
+    archive_state["posts"] = archive_indexes[name][category]
+
+    print(f"Generating archive for {category}")
+
+    page["category"] = category
+
+    fm = interpolate_front_matter(page, archive_state, "category")
+
+    fm["url"] = f"{BASE_URL}/{path}/{slugify(category)}/"
+
+    rendered_page = (
+        get_compiled_layout(archive_layout)
+        .template.render(
+            archive_state,
+            site=state,
+            posts=archive_state["posts"],
+            page=archive_state,
+        )
+        .strip()
+    )
+
+    if not archive_state.get("page"):
+        archive_state["page"] = {}
+
+    archive_state["page"]["template"] = archive_layout
+
+    rendered_page = recursively_build_page_template_with_front_matter(
+        archive_layout,
+        fm,
+        archive_state,
+        rendered_page,
+    )
+
+    return os.path.join(SITE_DIR, path, slugify(category), "index.html"), rendered_page
+
+
+def process_archives(
+    name: str,
+    state_key_associated_with_name: str,
+    path: str,
+    jobs: int = 1,
+    categories: set = None,
+):
     """
     Generate category archives for all posts.
 
     For example, if you have a post with the `category` key set to `writing`, generate:
 
     - /writing/index.html
+
+    If `categories` is given, only the archives of those categories are generated.
+
+    Archive pages are rendered over `jobs` worker processes.
     """
-    categories = set()
+    archive_indexes[name] = get_archive_index(state_key_associated_with_name)
+
+    for archive_path, rendered_page in render_in_worker_processes(
+        generate_archive_page,
+        [
+            (name, category, path)
+            for category in archive_indexes[name]
+            if categories is None or category in categories
+        ],
+        jobs,
+    ):
+        site_writer.write(archive_path, rendered_page)
 
-    for post in state["posts"]:
-        if not post.get(state_key_associated_with_name):
-            continue
 
-        for category in post[state_key_associated_with_name]:
-            categories.add(category)
+def copy_asset_to_site(assets: list) -> None:
+    """
+    Copy an asset from the `assets` directory to the `_site/assets` directory.
+    """
+    assets = [asset.replace("./assets/", "") for asset in assets]
 
-    for category in categories:
-        make_any_nonexistent_directories(
-            os.path.join(SITE_DIR, path, slugify(category))
+    for a in assets:
+        print(f"Copying {a} to _site/assets/{a}")
+        publish_asset(
+            os.path.join("assets", a),
+            os.path.join(SITE_DIR, "assets", a),
+            link=SITE_STATE.get("link_assets", False),
         )
 
-        archive_layout = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{name}.html"
-        archive_contents = all_opened_pages[archive_layout]
-
-        archive_state = state.copy()
-        archive_state[name] = category
-        page = deepcopy(all_parsed_pages[archive_layout])
-        page[name] = category
-        archive_state["posts"] = [
-            post
-            for post in state["posts"]
-            if category in post.get(state_key_associated_with_name, [])
-        ]
 
-        print(f"Generating archive for {category}")
+def get_state_from_last_build() -> dict:
+    """
+    Get the state from the last build.
+    """
+    try:
+        data = json.load(open("state.json", "r"))
+    except Exception as e:
+        print("Error reading state.json. Running a full build.")
+        return {}
+
+    return data
+
+
+def get_source_file_fingerprints(previous_fingerprints: dict) -> dict:
+    """
+    Fingerprint every page, layout and include in the site.
+
+    Files whose size and modification time match their previous fingerprint are not read.
+    """
+    fingerprints = {}
+
+    for root, _, files in os.walk(ROOT_DIR):
+        for file in files:
+            # must be of parsable extension
+            if os.path.splitext(file)[-1].replace(".", "") not in ALLOWED_EXTENSIONS:
+                continue
+
+            path = os.path.join(root, file)
+            fingerprints[path] = get_file_fingerprint(
+                path, previous_fingerprints.get(path)
+            )
+
+    return fingerprints
+
+
+def get_files_changed_since_last_build(saved_state: dict, fingerprints: dict) -> list:
+    """
+    Find the files in the site whose contents have changed, or that were added or removed, since the last build.
+    """
+    changed_files = []
+
+    previous_fingerprints = saved_state.get("file_fingerprints")
+
+    # state saved before content hashes were recorded
+    if previous_fingerprints is None:
+        last_build = datetime.datetime.strptime(
+            saved_state.get("last_build"), "%Y-%m-%dT%H:%M:%S.%f"
+        )
+        previous_fingerprints = {
+            path: fingerprint
+            for path, fingerprint in fingerprints.items()
+            if os.path.getmtime(path) <= last_build.timestamp()
+        }
+
+    for path, fingerprint in fingerprints.items():
+        previous_fingerprint = previous_fingerprints.get(path)
+
+        if previous_fingerprint and previous_fingerprint["hash"] == fingerprint["hash"]:
+            continue
+
+        print(f"Detected change in {path}. Rebuilding this page and its dependencies.")
+        changed_files.append(path)
+
+    for path in previous_fingerprints:
+        if path not in fingerprints:
+            print(f"Detected removal of {path}. Rebuilding its dependencies.")
+            changed_files.append(path)
+
+    return changed_files
+
+
+def get_data_record_path(record: dict, data_dir: str) -> str:
+    """
+    Get the path of the page generated from a data file record, i.e. `books/the-great-gatsby/index.html`.
+    """
+    return os.path.join(data_dir, str(record["slug"]), "index.html")
+
+
+def parse_data_record(record: dict, record_as_string: str, data_dir: str) -> tuple:
+    """
+    Turn a data file record into the contents and parsed page used to generate its page.
+
+    The parsed page is built from the record directly, rather than by parsing the
+    record as YAML front matter.
+    """
+    contents = "---\n" + record_as_string + "\n---\n"
+    # copy the record so that front matter set while rendering does not show up in `site.<collection>`
+    loaded_contents = frontmatter.Post("")
+    loaded_contents.metadata.update(record)
+    loaded_contents["skip"] = data_dir in SITE_STATE.get(
+        "disable_collection_single_page_generation", {}
+    )
+    if "body" in loaded_contents:
+        loaded_contents["content"] = loaded_contents["body"]
+        del loaded_contents["body"]
+
+    return contents, loaded_contents
+
+
+def get_data_file_integrity(
+    data_file: str, previous_data_file_integrity: dict
+) -> tuple:
+    """
+    Fingerprint a data file, and find out whether it has changed since the last build.
+
+    Returns the fingerprint of the data file, its previous record digests (keyed by slug), and
+    whether it has changed. The file is only read if its size or modification time changed.
+    """
+    previous_integrity = previous_data_file_integrity.get(data_file)
+
+    # state saved before data files were fingerprinted is keyed by record slug
+    if (
+        not isinstance(previous_integrity, dict)
+        or "fingerprint" not in previous_integrity
+    ):
+        previous_integrity = {"fingerprint": {}, "records": {}}
+
+    fingerprint = get_file_fingerprint(
+        os.path.join(DATA_FILES_DIR, data_file), previous_integrity["fingerprint"]
+    )
+    changed = fingerprint.get("hash") != previous_integrity["fingerprint"].get("hash")
+
+    return fingerprint, previous_integrity.get("records", {}), changed
+
+
+def load_data_from_data_files(
+    deps: list, data_file_integrity: dict, previous_data_file_integrity: dict = None
+) -> list:
+    """
+    Read all data files and create the pages generated from their records.
+
+    If `previous_data_file_integrity` is given (i.e. in incremental builds), the fingerprint of
+    every data file is recorded in `data_file_integrity`. Records are only hashed for data files
+    that changed since the last build, and the paths of the records that were added, changed
+    or removed are returned.
+    """
+
+    changed_files = []
+
+    for data_file in all_data_files:
+        data_dir = os.path.splitext(data_file)[0]
+        collections_to_files[data_dir] = []
+        print(f"Loading data from {data_file}...")
+
+        collection = Span(
+            build_profile,
+            data_file,
+            "data collection",
+            records=len(all_data_files[data_file]),
+        ).start()
+
+        data_file_changed = False
+
+        if previous_data_file_integrity is not None:
+            fingerprint, previous_records, data_file_changed = get_data_file_integrity(
+                data_file, previous_data_file_integrity
+            )
+            data_file_integrity[data_file] = {
+                "fingerprint": fingerprint,
+                "records": {} if data_file_changed else previous_records,
+            }
+            records = data_file_integrity[data_file]["records"]
+
+        for record in tqdm.tqdm(
+            prepare_records(all_data_files[data_file], data_dir),
+            total=len(all_data_files[data_file]),
+        ):
+            slug = str(record.get("slug"))
+            path = get_data_record_path(record, data_dir)
+
+            record_as_bytes = orjson.dumps(record)
+
+            reverse_deps.setdefault(path, set()).add(data_dir)
 
-        page["category"] = category
+            if render_cache or data_file_changed:
+                record_digest = hash_bytes(record_as_bytes)
 
-        fm = interpolate_front_matter(page, archive_state, "category")
+                if render_cache:
+                    source_digests[path] = record_digest
 
-        fm["url"] = f"{BASE_URL}/{path}/{slugify(category)}/"
+                if data_file_changed:
+                    if previous_records.get(slug) != record_digest:
+                        changed_files.append(path)
 
-        rendered_page = archive_contents.render(
-            archive_state,
-            site=state,
-            posts=archive_state["posts"],
-            page=archive_state,
-        )
+                    records[slug] = record_digest
 
-        if not archive_state.get("page"):
-            archive_state["page"] = {}
+            contents, loaded_contents = parse_data_record(
+                record, record_as_bytes.decode(), data_dir
+            )
+            all_opened_pages[path] = contents
+            all_page_contents[path] = loaded_contents
+            all_parsed_pages[path] = loaded_contents
+            collections_to_files[data_dir].append(path)
 
-        archive_state["page"]["template"] = archive_layout
+        if data_file_changed:
+            for slug in previous_records.keys() - records.keys():
+                changed_files.append(get_data_record_path({"slug": slug}, data_dir))
 
-        rendered_page = recursively_build_page_template_with_front_matter(
-            archive_layout,
-            fm,
-            archive_state,
-            loads(rendered_page).content,
-        )
+        collection.stop()
 
-        with open(
-            os.path.join(SITE_DIR, path, slugify(category), "index.html"),
-            "wb",
-            buffering=500,
-        ) as f:
-            f.write(rendered_page.encode())
+    return changed_files
 
 
-def copy_asset_to_site(assets: list) -> None:
-    """
-    Copy an asset from the `assets` directory to the `_site/assets` directory.
+def render_streamed_data_file(
+    data_file: str, jobs: int = 1, skip_hooks=False, previous_layouts: dict = None
+) -> dict:
     """
-    assets = [asset.replace("./assets/", "") for asset in assets]
+    Generate the pages for the records of a streamed data file, DATA_CHUNK_SIZE records at a time.
 
-    for a in assets:
-        print(f"Copying {a} to _site/assets/{a}")
-        make_any_nonexistent_directories(os.path.join(SITE_DIR, "assets"))
-        asset = read_file(os.path.join("assets", a), "rb")
-        with open(os.path.join(SITE_DIR, "assets", a), "wb") as f2:
-            f2.write(asset)
+    Only the records in the current chunk are held in memory. Records are not added to
+    the dependency graph; pages that read `site.<collection>` depend on the collection as a whole.
 
+    If `previous_layouts` is given (i.e. in incremental builds, if the data file has not changed),
+    pages are only generated if one of the layouts the records used in the last build has changed.
 
-def get_state_from_last_build() -> dict:
+    Returns the digest of every layout the records used.
     """
-    Get the state from the last build.
-    """
-    try:
-        data = json.load(open("state.json", "r"))
-    except Exception as e:
-        print("Error reading state.json. Running a full build.")
-        return {}
-
-    return data
+    collection = streamed_data_files[data_file]
 
+    if collection.data_dir in SITE_STATE.get(
+        "disable_collection_single_page_generation", {}
+    ):
+        return {}
 
-def calculate_dependencies_from_saved_state(all_dependencies: dict) -> list:
-    """
-    Read the saved state and compute dependencies of files that have changed since the last build.
-    """
-    deps = []
+    if previous_layouts and all(
+        digest is not None and get_layout_digest(layout) == digest
+        for layout, digest in previous_layouts.items()
+    ):
+        print(f"{data_file} has not changed. Skipping its pages.")
+        return previous_layouts
 
-    last_build = datetime.datetime.strptime(
-        get_state_from_last_build().get("last_build"), "%Y-%m-%dT%H:%M:%S.%f"
-    )
+    print(f"Generating pages from {data_file}...")
 
-    for root, dirs, files in os.walk(ROOT_DIR):
-        # add if has changed since last build
-        for file in files:
-            path = os.path.join(root, file)
-            # must be of parsable extension
-            if os.path.splitext(file)[-1].replace(".", "") not in ALLOWED_EXTENSIONS:
-                continue
+    layouts = set()
 
-            if os.path.getmtime(path) > last_build.timestamp():
-                print(
-                    f"Detected change in {path}. Rebuilding this page and its dependencies."
-                )
+    # one pool renders every chunk, rather than forking new workers for each chunk
+    pool = create_worker_pool(jobs) if can_use_worker_processes(jobs) else None
 
-                dependencies_of_dependencies = [
-                    i for i in all_dependencies if path in all_dependencies[i]
-                ] + [path]
-                deps.extend(dependencies_of_dependencies)
+    try:
+        render_streamed_records(collection, layouts, jobs, skip_hooks, pool)
+    finally:
+        if pool:
+            pool.shutdown()
 
-    return deps
+    return {layout: get_layout_digest(layout) for layout in layouts}
 
 
-def load_data_from_data_files(deps: list, data_file_integrity: dict) -> list:
+def render_streamed_records(
+    collection: StreamedCollection,
+    layouts: set,
+    jobs: int,
+    skip_hooks: bool,
+    pool: ProcessPoolExecutor = None,
+) -> None:
     """
-    Read all data files and create YAML file that can be used to generate pages.
+    Generate the pages for the records of a streamed data file, DATA_CHUNK_SIZE records at
+    a time, and add the layouts the records use to `layouts`.
     """
+    for records in chunked(collection, DATA_CHUNK_SIZE):
+        paths = []
+        pages = []
 
-    changed_files = []
-
-    for data_file in all_data_files:
-        data_dir = data_file.replace(".json", "").replace(".csv", "")
-        collections_to_files[data_dir] = []
-        idx = 0
-        print(f"Loading data from {data_file}...")
-
-        for record in tqdm.tqdm(all_data_files[data_file]):
-            if not record.get("slug"):
-                # print(
-                #     f"Note: {data_file} {record} does not have a 'slug' key. Assigning substitute ID."
-                # )
-                record["slug"] = str(idx)
-                idx += 1
-
-            if not record.get("layout"):
-                record["layout"] = data_dir
-
-            slug = record.get("slug")
-            path = os.path.join(data_dir, "index.html")
+        for record in records:
+            path = get_data_record_path(record, collection.data_dir)
 
-            record_as_string = orjson.dumps(record).decode()
-
-            if (
-                data_file_integrity.get(slug)
-                != hashlib.sha1(record_as_string.encode()).hexdigest()
-            ):
-                changed_files.append(path)
-                data_file_integrity[slug] = hashlib.sha1(
-                    record_as_string.encode()
-                ).hexdigest()
+            contents, parsed_page = parse_data_record(
+                record, orjson.dumps(record).decode(), collection.data_dir
+            )
 
-            try:
-                contents = "---\n" + record_as_string + "\n---\n"
-                loaded_contents = loads(contents)
-                loaded_contents["skip"] = data_dir in SITE_STATE.get(
-                    "disable_collection_single_page_generation", {}
-                )
-                if "body" in loaded_contents:
-                    loaded_contents["content"] = loaded_contents["body"]
-                    del loaded_contents["body"]
-                all_opened_pages[path] = contents
-                all_page_contents[path] = loaded_contents
-                all_parsed_pages[path] = loaded_contents
-                collections_to_files[data_dir].append(path)
-            except ReaderError as e:
-                print(
-                    f"Error reading {data_file} {record}. This page will not be generated.",
+            evaluate_front_matter(path, parsed_page)
+            layouts.add(f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{parsed_page['layout']}.html")
+
+            all_opened_pages[path] = contents
+            all_page_contents[path] = parsed_page
+            all_parsed_pages[path] = parsed_page
+            paths.append(path)
+            pages.append((path, contents, parsed_page, skip_hooks))
+
+        if pool:
+            outputs = [
+                _merge_rendered_page(path, result)
+                for path, result in zip(
+                    paths,
+                    render_in_worker_processes(
+                        _render_data_record_in_worker, pages, jobs, pool
+                    ),
                 )
-                # delete from all_page_contents
-                all_page_contents.pop(path, None)
-                all_opened_pages.pop(path, None)
-                all_opened_pages.pop(path, None)
-                continue
+            ]
+        else:
+            outputs = [
+                render_traced_page(path, skip_hooks=skip_hooks) for path in paths
+            ]
 
-    return changed_files
+        for output in outputs:
+            if output is not None:
+                site_writer.write(*output)
+
+        for path in paths:
+            all_opened_pages.pop(path, None)
+            all_page_contents.pop(path, None)
+            all_parsed_pages.pop(path, None)
+            template_digests.pop(path, None)
 
 
 def get_data_files_in_folder(folder: str) -> list:
@@ -1063,12 +2369,71 @@ def get_data_files_in_folder(folder: str) -> list:
         path = os.path.join(folder, entry)
         if os.path.isdir(path):
             files.extend(get_data_files_in_folder(path))
-        elif os.path.isfile(path) and path.endswith('.json'):
+        elif os.path.isfile(path) and path.endswith((".json", ".jsonl", ".csv")):
             files.append(path)
     return files
 
 
-def main(deps: list = [], watch: bool = False, incremental: bool = False) -> None:
+def reset_build_state() -> None:
+    """
+    Reset the values a build collects in module globals, so that every build in the same
+    process (i.e. while serving) starts from the same state, and memory does not grow
+    from one build to the next.
+    """
+    state.clear()
+    state.update(get_initial_state())
+
+    for accumulator in (
+        saved_pages,
+        permalinks,
+        original_file_to_permalink,
+        normalized_collection_permalinks,
+        all_data_files,
+        all_pages,
+        all_opened_pages,
+        all_page_contents,
+        collections_to_files,
+        all_dependencies,
+        all_parsed_pages,
+        reverse_deps,
+        collection_permalinks_to_idx,
+        layout_permalinks_to_idx,
+        source_digests,
+    ):
+        accumulator.clear()
+
+
+def get_changed_file_fingerprints(previous_fingerprints: dict, paths: list) -> dict:
+    """
+    Update the fingerprints of the last build with the fingerprints of the files in `paths`.
+
+    Files in `paths` that no longer exist are removed from the fingerprints.
+    """
+    fingerprints = dict(previous_fingerprints)
+
+    for path in paths:
+        if (
+            os.path.isfile(path)
+            and os.path.splitext(path)[-1].replace(".", "") in ALLOWED_EXTENSIONS
+        ):
+            fingerprints[path] = get_file_fingerprint(path, fingerprints.get(path))
+        else:
+            fingerprints.pop(path, None)
+
+    return fingerprints
+
+
+def main(
+    deps: list = [],
+    watch: bool = False,
+    incremental: bool = False,
+    jobs: int = 1,
+    write_if_changed: bool = False,
+    resident: bool = False,
+    debounce: float = DEFAULT_DEBOUNCE_WINDOW,
+    profile: bool = False,
+    trace: str = None,
+) -> None:
     """
     The Aurora runtime.
 
@@ -1076,93 +2441,276 @@ def main(deps: list = [], watch: bool = False, incremental: bool = False) -> Non
 
     - `aurora build` to build the site once, and;
     - `aurora serve` to watch for changes in the `pages` directory and rebuild the site in real time.
+
+    `jobs` sets the number of processes used to render pages. With `write_if_changed`, files whose
+    contents have not changed since the last build are not rewritten.
+
+    With `resident` (always set while serving), parsed pages, compiled templates, data files and
+    the dependency graph are kept in memory between builds. When `deps` is set, only the files in
+    `deps` are read again.
+
+    While serving, files that change within `debounce` seconds of each other are rebuilt together.
+
+    With `profile`, the wall time, CPU time and number of items processed in each phase of the
+    build are printed once the build has finished. With `trace`, the time spent rendering each
+    page, layout and hook is saved to the file at `trace` in the Chrome trace event format.
     """
 
     global state
-    global all_dependencies
+    global render_cache
+    global site_writer
+
+    global reverse_deps
+    global build_profile
+
+    reset_build_state()
+    build_profile = (
+        BuildProfile(trace=Trace() if trace else None) if profile or trace else None
+    )
 
     data_file_integrity = {}
+    resident = resident or watch
+    deps = [os.path.relpath(dep) for dep in deps] if resident else list(deps)
+    # the files that changed, before the files that depend on them are added to `deps`
+    changed_paths = set(deps)
 
     start = datetime.datetime.now()
 
+    template_digests.clear()
+    templates_reading_site.clear()
+    compiled_layouts.clear()
+    layout_chains.clear()
+    archive_indexes.clear()
+    layout_digests.clear()
+    sorted_collections.clear()
+    item_digests.clear()
+    front_matter_cache_info_before = compile_front_matter_expression.cache_info()
+    worker_front_matter_cache_stats.update(hits=0, misses=0)
+
+    if SITE_STATE.get("render_cache"):
+        render_cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_SIZE)
+
+    if resident and resident_state:
+        saved_state = resident_state
+    else:
+        saved_state = get_state_from_last_build() if incremental else {}
+
+    file_encodings.clear()
+    file_encodings.update(saved_state.get("file_encodings", {}))
+    file_fingerprints = {}
+    previous_outgoing_links = saved_state.get("outgoing_links", {})
+    outgoing_links = {}
+
+    if resident and deps and "file_fingerprints" in saved_state:
+        file_fingerprints = get_changed_file_fingerprints(
+            saved_state["file_fingerprints"], deps
+        )
+    elif incremental or resident:
+        file_fingerprints = get_source_file_fingerprints(
+            saved_state.get("file_fingerprints", {})
+        )
+
+    streamed_data_files.clear()
+    data_load = Phase(build_profile, "data load").start()
+
     if os.path.exists(DATA_FILES_DIR):
         for file in get_data_files_in_folder(DATA_FILES_DIR):
             # remove base /Users/james/src/airport-pianos/pages/
             file = file.replace(os.path.abspath(DATA_FILES_DIR) + "/", "")
-            # if dir, recurse
-            file_contents = read_file(os.path.join(DATA_FILES_DIR, file))
+            data_dir = os.path.splitext(file)[0]
+
+            if file in STREAMED_DATA_FILES:
+                path = os.path.join(DATA_FILES_DIR, file)
+                streamed_data_files[file] = StreamedCollection(
+                    path,
+                    data_dir,
+                    DATA_COLUMN_TYPES.get(file),
+                    get_file_encoding(path) if file.endswith(".csv") else "utf-8",
+                )
+                state[data_dir] = streamed_data_files[file]
+                continue
+
+            if (
+                resident
+                and deps
+                and file in resident_data_files
+                and os.path.join(DATA_FILES_DIR, file) not in changed_paths
+            ):
+                all_data_files[file] = resident_data_files[file]
+                state[data_dir] = all_data_files[file]
+                continue
 
             if os.path.splitext(file)[-1].replace(".", "") == "json":
+                file_contents = read_file(os.path.join(DATA_FILES_DIR, file))
                 all_data_files[file] = orjson.loads(file_contents)
                 if isinstance(all_data_files[file], dict):
                     all_data_files[file] = [
                         {k: v for k, v in all_data_files[file].items()}
                     ]
-                state[file.replace(".json", "")] = all_data_files[file]
+                state[data_dir] = all_data_files[file]
+            elif os.path.splitext(file)[-1].replace(".", "") == "jsonl":
+                file_contents = read_file(os.path.join(DATA_FILES_DIR, file))
+                all_data_files[file] = [
+                    orjson.loads(line)
+                    for line in file_contents.splitlines()
+                    if line.strip()
+                ]
+                state[data_dir] = all_data_files[file]
             elif os.path.splitext(file)[-1].replace(".", "") == "csv":
-                all_data_files[file] = list(csv.DictReader(file_contents.split("\n")))
-                state[file.replace(".csv", "")] = all_data_files[file]
+                path = os.path.join(DATA_FILES_DIR, file)
+                all_data_files[file] = list(
+                    iterate_csv(
+                        path, DATA_COLUMN_TYPES.get(file), get_file_encoding(path)
+                    )
+                )
+                state[data_dir] = all_data_files[file]
             else:
                 logging.debug(
                     f"Unsupported data file format: {file}", level=logging.CRITICAL
                 )
                 print(f"Unsupported data file format: {file}")
 
+            if resident and file in all_data_files:
+                resident_data_files[file] = all_data_files[file]
+
+    data_load.stop(items=len(all_data_files) + len(streamed_data_files))
+
+    staging_directory = None
+
+    # full builds are written to a staging directory that replaces the site once it is complete
+    if not deps and not incremental and SITE_STATE.get("staged_builds", False):
+        if can_swap_site_directory(SITE_DIR):
+            staging_directory = create_staging_directory(SITE_DIR)
+        else:
+            print(
+                f"{SITE_DIR} cannot be replaced in one step (i.e. it is a mount point), so the site will be written in place."
+            )
+
     if not os.path.exists(SITE_DIR):
         os.makedirs(SITE_DIR)
     else:
-        if not deps and not incremental:
+        # with write_if_changed, files that are no longer generated are removed after the build
+        if (
+            not deps
+            and not incremental
+            and not write_if_changed
+            and not staging_directory
+        ):
             for root, _, files in os.walk(SITE_DIR):
                 for file in files:
-                    os.remove(os.path.join(root, file))
-
-    for root, _, files in os.walk(ROOT_DIR):
-        for file in files:
-            ext = os.path.splitext(file)[-1].replace(".", "")
-            if ext not in ALLOWED_EXTENSIONS:
-                continue
+                    path = os.path.join(root, file)
+
+                    # assets are only copied again if they have changed
+                    if path.startswith(
+                        os.path.join(SITE_DIR, "assets", "")
+                    ) and os.path.isfile(os.path.relpath(path, SITE_DIR)):
+                        continue
+
+                    os.remove(path)
+
+    page_read = Phase(build_profile, "page read").start()
+
+    # while serving, only the pages affected by `deps` are linked and archived again
+    resident_rebuild = resident and bool(deps) and bool(resident_pages)
+    # the pages in `deps` as they were in the last build
+    previous_resident_pages = {}
+
+    if resident_rebuild:
+        # the pages are known from the last build. Only the files in `deps` can have been added or removed
+        for path in changed_paths:
+            if path in resident_pages:
+                previous_resident_pages[path] = resident_pages[path]
+
+            if not os.path.isfile(path):
+                resident_pages.pop(path, None)
+
+        all_pages.extend(resident_pages)
+        all_pages.extend(
+            path
+            for path in sorted(changed_paths)
+            if path not in resident_pages
+            and os.path.isfile(path)
+            and path.startswith(os.path.join(ROOT_DIR, ""))
+            and os.path.splitext(path)[-1].replace(".", "") in ALLOWED_EXTENSIONS
+        )
+    else:
+        for root, _, files in os.walk(ROOT_DIR):
+            for file in files:
+                ext = os.path.splitext(file)[-1].replace(".", "")
+                if ext not in ALLOWED_EXTENSIONS:
+                    continue
 
-            all_pages.append(os.path.join(root, file))
+                all_pages.append(os.path.join(root, file))
 
     for page in all_pages:
         if deps and page not in deps and not incremental:
             continue
 
-        contents = read_file(page)
+        resident_page = None
+
+        if resident and page not in changed_paths:
+            resident_page = resident_pages.get(page)
+
+        if resident_page:
+            contents = resident_page["contents"]
+        else:
+            contents = read_file(page)
+
+        # source digests let generated pages be fingerprinted in incremental builds
+        if resident_page:
+            source_digests[page] = resident_page["digest"]
+        elif render_cache or incremental or resident:
+            source_digests[page] = hashlib.sha1(contents.encode()).hexdigest()
 
         try:
-            if page.endswith(".md"):
-                all_opened_pages[page] = contents
+            if resident_page:
+                all_opened_pages[page] = resident_page["template"]
+                all_page_contents[page] = copy_parsed_page(
+                    resident_page["front_matter"]
+                )
             else:
-                all_opened_pages[page] = JINJA2_ENV.from_string(contents)
-
-            all_page_contents[page] = loads(contents)
+                if page.endswith(".md"):
+                    all_opened_pages[page] = contents
+                else:
+                    all_opened_pages[page] = JINJA2_ENV.from_string(contents)
+
+                with Phase(build_profile, "front matter parse", items=1):
+                    all_page_contents[page] = loads(contents)
+
+            if resident and not resident_page:
+                resident_pages[page] = {
+                    "contents": contents,
+                    "digest": source_digests[page],
+                    "template": all_opened_pages[page],
+                    "front_matter": copy_parsed_page(all_page_contents[page]),
+                    "category_keys": get_category_keys(all_page_contents[page]),
+                }
 
             if SITE_STATE.get("enable_backlinks"):
-                page_links = BeautifulSoup(
-                    pyromark.html(contents), "html.parser"
-                ).find_all("a", href=True)
-
-                # if in posts/, assign permalink
-                if page.startswith("pages/posts/"):
-                    # permalink should be YYYY-MM-DD-slug.md turned into /YYYY/MM/DD/slug/
-                    yyyy_mm_dd = re.search(r"\d{4}-\d{2}-\d{2}", page)
-                    if yyyy_mm_dd:
-                        yyyy_mm_dd = yyyy_mm_dd.group(0)
-                        slug = page.split(yyyy_mm_dd)[1].replace(".md", "")[1:]
-                        yyyy_mm_dd_slug = f"{yyyy_mm_dd.replace('-', '/')}/{slug}"
-
-                    # all_page_contents[page].metadata[
-                    #     "permalink"
-                    # ] = f"/{yyyy_mm_dd_slug.strip('/')}/"
-
-                all_page_contents[page].metadata["outgoing_links"] = page_links
+                links = previous_outgoing_links.get(page)
+
+                # links are only extracted again if the page has changed
+                if not links or links["hash"] != source_digests[page]:
+                    links = {
+                        "hash": source_digests.get(page),
+                        "links": get_outgoing_links(pyromark.html(contents)),
+                    }
+
+                outgoing_links[page] = links
+
+                all_page_contents[page].metadata["outgoing_links"] = [
+                    {"href": href} for href in links["links"]
+                ]
         except Exception as e:
             # logging.debug(f"Error reading {page}", level=logging.CRITICAL)
             # pass
             raise e
 
+    page_read.stop(items=len(all_page_contents))
+
     if SITE_STATE.get("enable_backlinks"):
+        backlinks = Phase(build_profile, "backlinks", items=len(outgoing_links)).start()
+
         for page in all_opened_pages:
             for link in all_page_contents[page].metadata.get("outgoing_links", []):
                 state["backlinks"][link["href"]].append(
@@ -1172,94 +2720,102 @@ def main(deps: list = [], watch: bool = False, incremental: bool = False) -> Non
                     }
                 )
 
-    # sort all_opened_pages alpha
-    all_opened_pages_sorted = list(sorted(all_page_contents.items()))
-    # reverse so that we can get next and previous
-    all_opened_pages_sorted.reverse()
-
-    for i, page in enumerate(all_opened_pages_sorted):
-        # add next and previous page
-        if i < len(all_opened_pages_sorted) - 1:
-            all_page_contents[page[0]].metadata["previous"] = {
-                "url": all_opened_pages_sorted[i + 1][1].metadata.get("permalink", ""),
-                "title": all_opened_pages_sorted[i + 1][1].metadata.get("title", ""),
-            }
-
-            previous_in_same_category = None
-            # look at all posts before i
-            for j in range(i + 1, len(all_opened_pages_sorted)):
-                # print(f"Comparing {all_opened_pages_sorted[j][1].metadata.get('categories', [])} with {page[1].metadata.get('categories', [])}")
-                if all_opened_pages_sorted[j][1].metadata.get("categories", []) == page[
-                    1
-                ].metadata.get("categories"):
-                    previous_in_same_category = all_opened_pages_sorted[j][1]
-                    break
-
-            if previous_in_same_category:
-                # print(f"Setting previous in same category for {page[1].metadata.get('title')} as {previous_in_same_category.metadata.get('title')} where next is {next_in_same_category.metadata.get('title') if next_in_same_category else None}")
-                all_page_contents[page[0]].metadata["previous_in_same_category"] = {
-                    "url": previous_in_same_category.metadata.get("permalink", ""),
-                    "title": previous_in_same_category.metadata.get("title", ""),
-                }
+        backlinks.stop()
 
-        if i > 0:
-            all_page_contents[page[0]].metadata["next"] = {
-                "url": all_opened_pages_sorted[i - 1][1].metadata.get("permalink", ""),
-                "title": all_opened_pages_sorted[i - 1][1].metadata.get("title", ""),
-            }
+    # sort all_opened_pages alpha, reversed so that we can get next and previous
+    with Phase(build_profile, "neighbour linking", items=len(all_page_contents)):
+        if resident:
+            relinked_pages = link_resident_neighbouring_pages(
+                sorted(all_page_contents, reverse=True), changed_paths
+            )
 
-            next_in_same_category = None
+            # pages whose links have changed are rendered again with their new links
+            if deps:
+                deps.extend(relinked_pages)
+        else:
+            link_neighbouring_pages(
+                [page for _, page in sorted(all_page_contents.items(), reverse=True)]
+            )
 
-            for j in range(i - 1, -1, -1):
-                if all_opened_pages_sorted[j][1].metadata.get("categories", []) == page[
-                    1
-                ].metadata.get("categories"):
-                    next_in_same_category = all_opened_pages_sorted[j][1]
-                    break
+    if deps:
+        deps = get_dependents(deps)
 
-            if next_in_same_category:
-                all_page_contents[page[0]].metadata["next_in_same_category"] = {
-                    "url": next_in_same_category.metadata.get("permalink", ""),
-                    "title": next_in_same_category.metadata.get("title", ""),
-                }
+    changed_files = []
+    # data files are fingerprinted in every incremental build, including the first one
+    previous_data_file_integrity = (
+        saved_state.get("data_file_integrity", {}) if incremental else None
+    )
+    with Phase(build_profile, "data collections", items=len(all_data_files)):
+        data_file_changes = load_data_from_data_files(
+            deps, data_file_integrity, previous_data_file_integrity
+        )
 
-    if deps:
-        deps = set(deps)
-        new_deps = []
+    if incremental:
+        # pages that read a streamed collection depend on the collection as a whole
+        for data_file, collection in streamed_data_files.items():
+            fingerprint, _, data_file_changed = get_data_file_integrity(
+                data_file, previous_data_file_integrity
+            )
+            data_file_integrity[data_file] = {
+                "fingerprint": fingerprint,
+                "layouts": (
+                    {}
+                    if data_file_changed
+                    else previous_data_file_integrity[data_file].get("layouts", {})
+                ),
+            }
 
-        while deps:
-            dep = deps.pop()
-            new_deps.append(dep)
-            if dep in reverse_deps:
-                deps.update(reverse_deps[dep])
+            if data_file_changed:
+                data_file_changes.append(collection.data_dir)
 
-        deps = new_deps
+    if saved_state:
+        changed_files.extend(data_file_changes)
+        changed_files.extend(
+            get_files_changed_since_last_build(saved_state, file_fingerprints)
+        )
 
-    if incremental:
-        data = get_state_from_last_build()
+        if not changed_files and not deps:
+            print("No changes detected. Exiting.")
+            return
 
-        if data != {}:
-            data_file_integrity = data.get("data_file_integrity", {})
-            changed_files = load_data_from_data_files(deps, data_file_integrity)
-            deps.extend(changed_files)
-            deps.extend(calculate_dependencies_from_saved_state(all_dependencies))
+        for dependency, dependents in saved_state.get(
+            "reverse_dependencies", {}
+        ).items():
+            reverse_deps.setdefault(dependency, set()).update(dependents)
 
-            if len(deps) == 0:
-                print("No changes detected. Exiting.")
-                return
-        else:
-            load_data_from_data_files(deps, data_file_integrity)
-    else:
-        load_data_from_data_files(deps, data_file_integrity)
+    saved_dependencies = saved_state.get("dependencies", {})
+    changed_files_set = set(changed_files)
+    dependency_analysis = Phase(build_profile, "dependency analysis").start()
 
     for page, contents in all_opened_pages.items():
         # if incremental, only recompute dependencies for changed files
         if deps and page not in deps and not incremental:
             continue
 
+        known_dependencies = None
+
+        if page in saved_dependencies and page not in changed_files_set:
+            known_dependencies = saved_dependencies[page]
+
+        resident_page = resident_pages.get(page) if resident else None
+        evaluated_front_matter = (
+            resident_page.get("evaluated_front_matter") if resident_page else None
+        )
+
+        if resident_page and evaluated_front_matter is None:
+            front_matter = copy_front_matter(all_page_contents[page].metadata)
+
         dependencies, parsed_page = get_file_dependencies_and_evaluated_contents(
-            page, contents
+            page, contents, known_dependencies, evaluated_front_matter
         )
+
+        # the values evaluate_front_matter adds are kept while serving, so unchanged pages
+        # are not evaluated again
+        if resident_page and evaluated_front_matter is None:
+            resident_page["evaluated_front_matter"] = get_changed_front_matter(
+                front_matter, parsed_page.metadata
+            )
+
         all_dependencies[page] = dependencies
         all_parsed_pages[page] = parsed_page
 
@@ -1268,31 +2824,32 @@ def main(deps: list = [], watch: bool = False, incremental: bool = False) -> Non
                 reverse_deps[dependency] = set()
             reverse_deps[dependency].add(page)
 
+        for state_key in get_state_keys_filled_by(parsed_page):
+            reverse_deps.setdefault(page, set()).add(state_key)
+
         if page.startswith("posts/"):
             state["posts"].append(parsed_page)
 
-    posts = [
-        key
-        for key in all_opened_pages.keys()
-        if key.startswith(os.path.join(ROOT_DIR, "/posts"))
-    ]
+    dependency_analysis.stop(items=len(all_opened_pages))
 
-    for post in posts:
-        if not hasattr(all_parsed_pages[post], "metadata"):
-            continue
+    if changed_files:
+        deps.extend(get_dependents(changed_files))
 
-        if all_parsed_pages[post].metadata.get("date"):
-            date = all_parsed_pages[post].metadata["date"]
-            dates.add(date)
-            if date.year not in years:
-                years[date.year] = {}
-            if date.month not in years[date.year]:
-                years[date.year][date.month] = {}
-            if date.day not in years[date.year][date.month]:
-                years[date.year][date.month][date.day] = []
-            years[date.year][date.month][date.day].append(post)
+    graph_size = get_dependency_graph_size()
+    print(
+        f"Dependency graph: {graph_size['nodes']} nodes, {graph_size['edges']} edges."
+    )
 
-    state["years"] = years
+    state["years"] = get_date_archive_tree()
+
+    if incremental and not resident:
+        # rendering adds values to the front matter of the pages it renders, and incremental
+        # builds only render some pages, so the pages listed on date archives and paginated
+        # pages are fingerprinted before rendering. While serving, the values rendering
+        # added are kept, so pages are fingerprinted once they have been rendered
+        for parsed_page in all_parsed_pages.values():
+            if hasattr(parsed_page, "metadata"):
+                get_item_digest(parsed_page)
 
     state["posts"] = sorted(
         state["posts"],
@@ -1305,103 +2862,381 @@ def main(deps: list = [], watch: bool = False, incremental: bool = False) -> Non
         reverse=True,
     )
 
-    all_dependencies = {
+    # layouts stay in all_dependencies so the render cache can follow layout chains
+    page_dependencies = {
         k: v for k, v in all_dependencies.items() if not k.startswith("pages/_")
     }
 
-    dependencies = (
-        deps
-        if incremental and len(deps) > 0
-        else list(toposort_flatten(all_dependencies))
-    )
+    with Phase(build_profile, "toposort", items=len(page_dependencies)):
+        dependencies = list(toposort_flatten(page_dependencies))
 
+    if incremental and len(deps) > 0:
+        deps_set = set(deps)
+        dependencies = [
+            dependency for dependency in dependencies if dependency in deps_set
+        ]
+
+    # state keys (i.e. `posts`) are part of the graph, but are not files
     dependencies = [
         dependency
         for dependency in dependencies
-        if not dependency.startswith("pages/_")
+        if not dependency.startswith("pages/_") and dependency not in state
     ]
 
-    if watch:
-        iterator = dependencies
-    else:
-        iterator = tqdm.tqdm(dependencies)
-
-    iterator_set = set(iterator)
-
-    print("Generating pages in memory...")
+    iterator_set = set(dependencies)
+    files_to_render = []
 
-    for file in iterator:
+    for file in dependencies:
         if os.path.isdir(file):
             for root, _, files in os.walk(file):
                 for file in files:
                     file_path = os.path.join(root, file)
                     if file_path not in iterator_set:
-                        render_page(file_path, skip_hooks=watch)
+                        files_to_render.append(file_path)
         else:
-            render_page(file, skip_hooks=watch)
+            files_to_render.append(file)
 
-    print("Saving files to disk...")
+    deps_set = set(deps)
+    site_writer = SiteWriter(
+        skip_unchanged=write_if_changed,
+        site_directory=SITE_DIR,
+        staging_directory=staging_directory,
+    )
 
-    if not incremental:
-        for root, _, files in os.walk("assets"):
-            for file in files:
-                path = os.path.join(SITE_DIR, root)
-                if not os.path.exists(path):
-                    os.makedirs(path)
-                contents = read_file(os.path.join(root, file), "rb")
-
-                with open(os.path.join(SITE_DIR, root, file), "wb") as f2:
-                    f2.write(contents)
-
-    if incremental and deps:
-        for file in tqdm.tqdm(state_to_write):
-            if original_file_to_permalink.get(file) in deps:
-                with open(file, "wb", buffering=1000) as f:
-                    f.write(state_to_write[file].encode())
+    def save_page(file: str, output) -> None:
+        if output is None:
+            return
+
+        if incremental and deps and file not in deps_set:
+            return
+
+        site_writer.write(*output)
+
+    print("Generating and saving pages...")
+
+    if resident:
+        front_matter_before_rendering = {
+            file: copy_front_matter(all_parsed_pages[file].metadata)
+            for file in files_to_render
+            if hasattr(all_parsed_pages.get(file), "metadata")
+        }
+
+    rendering = Phase(build_profile, "render", items=len(files_to_render)).start()
+
+    if jobs > 1:
+        render_pages_in_parallel(
+            files_to_render,
+            jobs,
+            save_page,
+            skip_hooks=watch,
+            show_progress=not watch,
+        )
     else:
-        for file in tqdm.tqdm(state_to_write):
-            with open(file, "wb", buffering=1000) as f:
-                f.write(state_to_write[file].encode())
+        for file in files_to_render if watch else tqdm.tqdm(files_to_render):
+            save_page(file, render_traced_page(file, skip_hooks=watch))
+
+    rendering.stop()
+
+    # the archives that list pages changed or removed since the last build
+    archive_scope = None
+
+    # the values render_page adds (i.e. a post's `slug` without its date) are kept with each
+    # page while serving, and added again to pages that are not rendered again. So are
+    # the digests of pages, which only change when a page is rendered
+    if resident:
+        archive_scope = {"dates": set(), "categories": set(), "tags": set()}
+
+        for page, resident_page in resident_pages.items():
+            if page not in all_parsed_pages:
+                continue
+
+            parsed_page = all_parsed_pages[page]
+
+            if page in front_matter_before_rendering:
+                resident_page["rendered_front_matter"] = get_changed_front_matter(
+                    front_matter_before_rendering[page], parsed_page.metadata
+                )
+            else:
+                parsed_page.metadata.update(
+                    copy_front_matter(resident_page.get("rendered_front_matter", {}))
+                )
+
+                if "item_digest" in resident_page:
+                    item_digests[id(parsed_page)] = resident_page["item_digest"]
+                    continue
 
-    if any(k.startswith("pages/") for k in all_dependencies):
+            previous_resident_page = previous_resident_pages.get(page, resident_page)
+            previous_item_digest = previous_resident_page.get("item_digest")
+            previous_archive_keys = previous_resident_page.get("archive_keys", {})
+
+            resident_page["item_digest"] = get_item_digest(parsed_page)
+            resident_page["archive_keys"] = get_archive_keys(parsed_page.metadata)
+
+            if (
+                resident_page["item_digest"] is None
+                or resident_page["item_digest"] != previous_item_digest
+            ):
+                for keys in (previous_archive_keys, resident_page["archive_keys"]):
+                    for key, values in keys.items():
+                        archive_scope[key].update(values)
+
+        for page, previous_resident_page in previous_resident_pages.items():
+            if page not in resident_pages:
+                for key, values in previous_resident_page.get(
+                    "archive_keys", {}
+                ).items():
+                    archive_scope[key].update(values)
+
+        if not resident_rebuild:
+            archive_scope = None
+
+    # streamed data files are not part of the dependency graph, so they are only
+    # skipped when rebuilding the pages that depend on a change while serving
+    if not deps or incremental:
+        streamed = Phase(
+            build_profile, "streamed data files", writer=site_writer
+        ).start()
+
+        for data_file in streamed_data_files:
+            with Span(build_profile, data_file, "data collection"):
+                layouts = render_streamed_data_file(
+                    data_file,
+                    jobs,
+                    skip_hooks=watch,
+                    previous_layouts=data_file_integrity.get(data_file, {}).get(
+                        "layouts"
+                    ),
+                )
+
+            if data_file in data_file_integrity:
+                data_file_integrity[data_file]["layouts"] = layouts
+
+        streamed.stop()
+
+    if render_cache:
+        print(f"Render cache: {render_cache.hits} hits, {render_cache.misses} misses.")
+        render_cache.evict()
+
+    print("Copying assets...")
+
+    if not incremental:
+        assets = Phase(build_profile, "assets").start()
+
+        if staging_directory:
+            asset_paths, copied_assets = publish_assets(
+                "assets",
+                staging_directory,
+                link=SITE_STATE.get("link_assets", False),
+                previous_site_directory=SITE_DIR,
+            )
+        else:
+            asset_paths, copied_assets = publish_assets(
+                "assets", SITE_DIR, link=SITE_STATE.get("link_assets", False)
+            )
+
+        for path in asset_paths:
+            site_writer.keep(path)
+
+        print(
+            f"Copied {copied_assets} assets ({len(asset_paths) - copied_assets} unchanged)."
+        )
+
+        assets.stop(items=len(asset_paths))
+
+    date_archive_fingerprints = saved_state.get("date_archive_fingerprints", {})
+
+    def get_archive_scope(layout: str, key: str):
+        """
+        Get the archives to generate again with `layout` while serving, or None if every
+        archive is generated (i.e. because the layout has changed).
+        """
+        if not resident:
+            return None
+
+        layout_path = f"{ROOT_DIR}/{LAYOUTS_BASE_DIR}/{layout}.html"
+        layout_digest = (
+            get_layout_digest(layout_path) if layout_path in all_opened_pages else None
+        )
+        previous_layout_digest = resident_archive_digests.get(layout_path)
+        resident_archive_digests[layout_path] = layout_digest
+
+        if (
+            archive_scope is None
+            or layout_digest is None
+            or layout_digest != previous_layout_digest
+        ):
+            return None
+
+        return archive_scope[key]
+
+    if any(k.startswith("pages/") for k in page_dependencies):
         if "skip_date_archive_page_generation" not in SITE_STATE:
-            process_date_archives()
+            with Phase(build_profile, "date archives", writer=site_writer):
+                date_archive_fingerprints = process_date_archives(
+                    (
+                        saved_state.get("date_archive_fingerprints", {})
+                        if incremental or resident
+                        else None
+                    ),
+                    jobs,
+                    get_archive_scope("date", "dates"),
+                )
         if "skip_category_page_generation" not in SITE_STATE:
-            process_archives(
-                SITE_STATE.get("category_template", "category"),
-                "categories",
-                SITE_STATE.get("category_slug_root", "category"),
-            )
+            category_template = SITE_STATE.get("category_template", "category")
+
+            with Phase(build_profile, "category archives", writer=site_writer):
+                process_archives(
+                    category_template,
+                    "categories",
+                    SITE_STATE.get("category_slug_root", "category"),
+                    jobs,
+                    get_archive_scope(category_template, "categories"),
+                )
         if "skip_tag_page_generation" not in SITE_STATE:
-            process_archives(
-                SITE_STATE.get("tag_template", "tag"),
-                "tags",
-                SITE_STATE.get("tag_slug_root", "tag"),
-            )
+            tag_template = SITE_STATE.get("tag_template", "tag")
+
+            with Phase(build_profile, "tag archives", writer=site_writer):
+                process_archives(
+                    tag_template,
+                    "tags",
+                    SITE_STATE.get("tag_slug_root", "tag"),
+                    jobs,
+                    get_archive_scope(tag_template, "tags"),
+                )
+
+    paginator_fingerprints = {}
+    paginators = Phase(build_profile, "paginators", writer=site_writer).start()
 
     for collection_name, attributes in SITE_STATE.get("paginators", {}).items():
-        generate_paginated_page_for_collection(
-            collection_name, attributes["per_page"], attributes["template"]
+        paginator_fingerprints.update(
+            generate_paginated_page_for_collection(
+                collection_name,
+                attributes["per_page"],
+                attributes["template"],
+                (
+                    saved_state.get("paginator_fingerprints", {})
+                    if incremental or resident
+                    else None
+                ),
+                jobs,
+            )
+        )
+
+    paginators.stop()
+
+    with Phase(build_profile, "finish writing"):
+        site_writer.close()
+
+        if staging_directory:
+            try:
+                old_site = swap_site_directory(SITE_DIR, staging_directory)
+            except OSError as error:
+                print(
+                    f"Could not replace {SITE_DIR} in one step ({error}), so the site was moved into it."
+                )
+                move_into_site_directory(SITE_DIR, staging_directory)
+                old_site = None
+
+            if old_site:
+                remove_in_background(old_site)
+
+    if build_profile:
+        # pages are written on a background thread while they are rendered
+        build_profile.add(
+            "write (background thread)",
+            site_writer.write_time,
+            site_writer.write_cpu_time,
+            site_writer.written + site_writer.skipped,
         )
 
+    summary = f"Wrote {site_writer.written} files"
+
+    if staging_directory:
+        summary += f", linked {site_writer.skipped} unchanged files from the last build"
+    elif write_if_changed:
+        summary += f", skipped {site_writer.skipped} unchanged files"
+
+        if not deps and not incremental:
+            removed = site_writer.remove_unwritten_files(SITE_DIR)
+            summary += f", removed {removed} files that are no longer generated"
+
+    print(summary + ".")
+
+    front_matter_cache_info = compile_front_matter_expression.cache_info()
+    front_matter_cache_hits = (
+        front_matter_cache_info.hits
+        - front_matter_cache_info_before.hits
+        + worker_front_matter_cache_stats["hits"]
+    )
+    front_matter_cache_misses = (
+        front_matter_cache_info.misses
+        - front_matter_cache_info_before.misses
+        + worker_front_matter_cache_stats["misses"]
+    )
+
+    print(
+        f"Front matter cache: {front_matter_cache_hits} hits, {front_matter_cache_misses} misses."
+    )
+
     for hooks in EVALUATED_POST_BUILD_HOOKS.values():
         for hook in hooks:
-            hook(state)
+            with Phase(
+                build_profile,
+                get_hook_name("post_build", hook),
+                items=1,
+                category="hook",
+            ):
+                hook(state)
+
+    if incremental or resident:
+        reverse_deps = get_reverse_dependencies()
 
-    if incremental:
         to_save = {
             "last_build": state["build_timestamp"],
             "data_file_integrity": data_file_integrity,
+            "file_fingerprints": file_fingerprints,
+            "date_archive_fingerprints": date_archive_fingerprints,
+            "paginator_fingerprints": paginator_fingerprints,
+            "outgoing_links": outgoing_links,
+            "file_encodings": {
+                file: encoding
+                for file, encoding in file_encodings.items()
+                if os.path.exists(file)
+            },
+            "dependencies": {
+                file: sorted(dependencies)
+                for file, dependencies in all_dependencies.items()
+            },
+            "reverse_dependencies": {
+                dependency: sorted(dependents)
+                for dependency, dependents in reverse_deps.items()
+            },
         }
 
-        json.dump(to_save, open("state.json", "w"))
+        if resident:
+            resident_state.clear()
+            resident_state.update(to_save)
+
+        # while serving, the state of the last build is kept in memory
+        if incremental and not (resident and deps):
+            json.dump(to_save, open("state.json", "w"))
 
     print(
         f"Built site in \033[94m{(datetime.datetime.now() - start).total_seconds():.3f}s\033[0m ✨\n"
     )
 
+    if profile:
+        print(build_profile.report() + "\n")
+
+    if trace:
+        build_profile.trace.save(trace)
+        print(build_profile.trace.summary() + "\n")
+        print(f"Saved trace to {trace}.")
+
     if watch:
         from livereload import Server
+        from livereload.handlers import LiveReloadHandler
+        from tornado.ioloop import IOLoop
 
         srv = Server()
 
@@ -1418,7 +3253,24 @@ def main(deps: list = [], watch: bool = False, incremental: bool = False) -> Non
         print("View your site at \033[92mhttp://localhost:8000\033[0m")
         print("Press Ctrl+C to stop.")
 
-        srv.watch(ROOT_DIR, lambda: main(deps=[srv.watcher.filepath], incremental=True))
+        # browsers are reloaded once the rebuild has finished, rather than when a change is seen
+        changes = ChangeCollector(
+            lambda paths: main(deps=paths, incremental=True, resident=True),
+            window=debounce,
+            on_rebuilt=lambda paths: IOLoop.instance().add_callback(
+                LiveReloadHandler.reload_waiters, "*"
+            ),
+        )
+
+        def collect_changes(paths: list = None) -> None:
+            # a glob task is given every file that changed since the last check. Only one
+            # removed file is reported, as `srv.watcher.filepath`
+            changes.add(paths or [srv.watcher.filepath])
+
+            # livereload reloads browsers as soon as a task sets a file path
+            srv.watcher.filepath = None
+
+        srv.watch(f"{ROOT_DIR}/**/*", collect_changes)
         srv.watch("./assets", lambda: copy_asset_to_site([srv.watcher.filepath]))
         srv.serve(root=SITE_DIR, liveport=35729, port=8000, debug=False)
     else:
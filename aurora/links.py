@@ -0,0 +1,38 @@
+from html.parser import HTMLParser
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Collect the `href` of every `<a>` tag in an HTML document, without building a DOM.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+
+        href = None
+
+        # if an attribute is repeated, the last value wins
+        for name, value in attrs:
+            if name == "href":
+                href = value or ""
+
+        if href is not None:
+            self.links.append(href)
+
+    handle_startendtag = handle_starttag
+
+
+def get_outgoing_links(html: str) -> list:
+    """
+    Get the `href` of every `<a>` tag in `html`, in document order.
+    """
+    extractor = LinkExtractor()
+    extractor.feed(html)
+    extractor.close()
+
+    return extractor.links
@@ -0,0 +1,110 @@
+def _hashable(value):
+    """
+    Convert front matter values (i.e. lists of categories) into values that can be used as dictionary keys.
+
+    Two values are converted into the same key if, and only if, they are equal.
+    """
+    if isinstance(value, list):
+        return (list, tuple(_hashable(item) for item in value))
+    if isinstance(value, dict):
+        return (dict, frozenset((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+
+    return value
+
+
+# the front matter values set on each page, in the order they are set
+NEIGHBOUR_KEYS = (
+    "previous",
+    "previous_in_same_category",
+    "next",
+    "next_in_same_category",
+)
+
+
+def _link(page) -> dict:
+    return {
+        "url": page.metadata.get("permalink", ""),
+        "title": page.metadata.get("title", ""),
+    }
+
+
+def get_category_keys(page) -> tuple:
+    """
+    Get the categories a page looks for, and the categories other pages find it by.
+
+    A page that does not set `categories` looks for pages that set `categories` to nothing,
+    but is found by pages that set `categories` to an empty list.
+    """
+    return (
+        _hashable(page.metadata.get("categories")),
+        _hashable(page.metadata.get("categories", [])),
+    )
+
+
+def find_neighbouring_pages(category_keys: list) -> list:
+    """
+    Find the neighbours of every page, given the `get_category_keys` of each page.
+
+    The previous page of page `i` is page `i + 1`, and the next page is page `i - 1`.
+    The previous page in the same category is the nearest page after page `i` that is
+    found by the categories page `i` looks for.
+
+    Returns, for each page, the indices of its neighbours in the order of `NEIGHBOUR_KEYS`,
+    with None where a page has no such neighbour.
+
+    This takes one pass over the pages in each direction, remembering the last page seen
+    with each set of categories.
+    """
+    neighbours = [[None] * len(NEIGHBOUR_KEYS) for _ in category_keys]
+
+    last_page_with_categories = {}
+
+    for i in range(len(category_keys) - 1, -1, -1):
+        wanted_categories, categories = category_keys[i]
+
+        if i < len(category_keys) - 1:
+            neighbours[i][0] = i + 1
+            neighbours[i][1] = last_page_with_categories.get(wanted_categories)
+
+        last_page_with_categories[categories] = i
+
+    last_page_with_categories = {}
+
+    for i, (wanted_categories, categories) in enumerate(category_keys):
+        if i > 0:
+            neighbours[i][2] = i - 1
+            neighbours[i][3] = last_page_with_categories.get(wanted_categories)
+
+        last_page_with_categories[categories] = i
+
+    return [tuple(page_neighbours) for page_neighbours in neighbours]
+
+
+def get_neighbour_links(pages: list, neighbours: tuple) -> dict:
+    """
+    Get the front matter values that link a page to its `neighbours`, as found by
+    `find_neighbouring_pages` in `pages`.
+    """
+    return {
+        key: _link(pages[i])
+        for key, i in zip(NEIGHBOUR_KEYS, neighbours)
+        if i is not None
+    }
+
+
+def link_neighbouring_pages(pages: list) -> None:
+    """
+    Set the `previous`, `next`, `previous_in_same_category` and `next_in_same_category`
+    front matter values of every page in `pages`.
+
+    The previous page of `pages[i]` is `pages[i + 1]`, and the next page is `pages[i - 1]`.
+    The previous page in the same category is the nearest page after `pages[i]` whose
+    `categories` are equal to those of `pages[i]`. A page that does not set `categories`
+    is only linked to pages that set `categories` to nothing (i.e. `categories:`).
+    """
+    neighbours = find_neighbouring_pages([get_category_keys(page) for page in pages])
+
+    for page, page_neighbours in zip(pages, neighbours):
+        page.metadata.update(get_neighbour_links(pages, page_neighbours))
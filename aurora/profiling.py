@@ -0,0 +1,318 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# the number of pages and layouts listed in the summary of a trace
+TRACE_SUMMARY_SIZE = 10
+
+
+def get_cpu_time() -> float:
+    """
+    Get the CPU time used by this process and by worker processes that have finished.
+    """
+    times = os.times()
+
+    # process_time is more precise than the times of this process reported by os.times
+    return time.process_time() + times.children_user + times.children_system
+
+
+def get_hook_name(kind: str, hook) -> str:
+    """
+    Get the name under which a hook is profiled, i.e. `post_build hook hooks.count_pages`.
+    """
+    return f"{kind} hook {hook.__module__}.{hook.__qualname__}"
+
+
+class Trace:
+    """
+    Spans of time recorded during a build, such as the rendering of each page and each level
+    of its layout, saved in the Chrome trace event format.
+
+    Traces can be opened in https://ui.perfetto.dev, chrome://tracing or speedscope, which
+    show them as a flame graph. Spans recorded in worker processes are shown on their own rows.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.pid = os.getpid()
+
+    def add(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        duration: float,
+        args: dict = None,
+    ) -> None:
+        """
+        Add a span that started at `start` (from `time.perf_counter()`) and took `duration` seconds.
+        """
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start * 1_000_000,
+            "dur": duration * 1_000_000,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+        }
+
+        if args:
+            event["args"] = args
+
+        self.events.append(event)
+
+    def get_slowest(self, category: str, top: int = TRACE_SUMMARY_SIZE) -> list:
+        """
+        Get the names of the `top` spans in `category` that took longest, added up by name,
+        with the total time they took and the number of times they ran.
+        """
+        totals = {}
+
+        for event in self.events:
+            if event["cat"] == category:
+                duration, count = totals.get(event["name"], (0.0, 0))
+                totals[event["name"]] = (duration + event["dur"] / 1_000_000, count + 1)
+
+        return sorted(
+            ((name, duration, count) for name, (duration, count) in totals.items()),
+            key=lambda span: span[1],
+            reverse=True,
+        )[:top]
+
+    def summary(self, top: int = TRACE_SUMMARY_SIZE) -> str:
+        """
+        List the pages and layouts that took longest to render.
+        """
+        lines = ["Slowest pages:"]
+
+        for name, duration, _ in self.get_slowest("page", top):
+            lines.append(f"{duration:>9.3f}s  {name}")
+
+        lines.append("Slowest layouts:")
+
+        for name, duration, count in self.get_slowest("layout", top):
+            renders = "render" if count == 1 else "renders"
+            lines.append(f"{duration:>9.3f}s  {name} ({count} {renders})")
+
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        processes = {event["pid"] for event in self.events} | {self.pid}
+
+        # name each process, so worker processes can be told apart from Aurora
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": "aurora" if pid == self.pid else f"worker {pid}"},
+            }
+            for pid in sorted(processes)
+        ]
+
+        with open(path, "w") as f:
+            json.dump(
+                {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f
+            )
+
+
+class BuildProfile:
+    """
+    The wall time, CPU time and number of items processed in each phase of a build.
+
+    Phases are listed in the order they first ran. A phase that runs inside another phase
+    (i.e. front matter parsing while pages are read) is indented below it, and its time is
+    also part of the outer phase. Phases that run more than once, such as hooks, are added up.
+
+    If `trace` is set, every phase is also recorded as a span in the trace.
+    """
+
+    def __init__(self, trace: Trace = None):
+        self.phases = {}
+        self.depth = 0
+        self.trace = trace
+
+    def add(
+        self, name: str, wall: float, cpu: float, items: int = 0, calls: int = 1
+    ) -> None:
+        """
+        Add time spent in a phase, i.e. measured in a worker process.
+        """
+        if name not in self.phases:
+            self.phases[name] = {
+                "wall": 0.0,
+                "cpu": 0.0,
+                "items": 0,
+                "calls": 0,
+                "depth": self.depth,
+            }
+
+        phase = self.phases[name]
+        phase["wall"] += wall
+        phase["cpu"] += cpu
+        phase["items"] += items
+        phase["calls"] += calls
+
+    def merge(self, profile: "BuildProfile") -> None:
+        """
+        Add the phases and spans of another profile, i.e. of a page rendered in a worker process.
+        """
+        for name, phase in profile.phases.items():
+            self.add(name, phase["wall"], phase["cpu"], phase["items"], phase["calls"])
+
+        if self.trace is not None and profile.trace is not None:
+            self.trace.events.extend(profile.trace.events)
+
+    def report(self) -> str:
+        """
+        Format the profile as a table.
+        """
+        names = {
+            name: "  " * phase["depth"] + name for name, phase in self.phases.items()
+        }
+        width = max(len(name) for name in ["Phase", *names.values()])
+
+        lines = [f"{'Phase':<{width}}  {'Wall':>9}  {'CPU':>9}  {'Items':>8}"]
+
+        for name, phase in self.phases.items():
+            lines.append(
+                f"{names[name]:<{width}}  {phase['wall']:>8.3f}s  {phase['cpu']:>8.3f}s  {phase['items']:>8}"
+            )
+
+        return "\n".join(lines)
+
+
+class Phase:
+    """
+    Measure a phase of a build, either as a context manager or between `start()` and `stop()`.
+    Nothing is measured if `profile` is None.
+
+    The number of items processed can be given to `stop()`. If `writer` (a `SiteWriter`) is
+    given, the number of pages queued on it during the phase is counted as items processed.
+    `category` is the category of the phase's span in the trace, if the build is traced.
+    """
+
+    __slots__ = (
+        "profile",
+        "name",
+        "items",
+        "writer",
+        "category",
+        "wall",
+        "cpu",
+        "queued",
+    )
+
+    def __init__(
+        self,
+        profile: BuildProfile,
+        name: str,
+        items: int = 0,
+        writer=None,
+        category: str = "phase",
+    ):
+        self.profile = profile
+        self.name = name
+        self.items = items
+        self.writer = writer
+        self.category = category
+
+    def start(self) -> "Phase":
+        if self.profile is not None:
+            self.profile.add(self.name, 0.0, 0.0, calls=0)
+            self.profile.depth += 1
+            self.queued = self.writer.queued if self.writer else 0
+            self.cpu = get_cpu_time()
+            self.wall = time.perf_counter()
+
+        return self
+
+    def stop(self, items: int = None) -> None:
+        if self.profile is None:
+            return
+
+        wall = time.perf_counter() - self.wall
+        cpu = get_cpu_time() - self.cpu
+        self.profile.depth -= 1
+
+        if items is not None:
+            self.items = items
+
+        if self.writer:
+            self.items += self.writer.queued - self.queued
+
+        self.profile.add(self.name, wall, cpu, self.items)
+
+        if self.profile.trace is not None:
+            self.profile.trace.add(
+                self.name, self.category, self.wall, wall, {"items": self.items}
+            )
+
+    def __enter__(self) -> "Phase":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> bool:
+        self.stop()
+
+        return False
+
+
+class Span:
+    """
+    Record how long something took, such as rendering one page, as a span in the build's trace.
+    Nothing is recorded unless the build is traced.
+
+    Unlike phases, spans are not added up in the profile, so there can be one for every page.
+    """
+
+    __slots__ = ("trace", "name", "category", "args", "wall")
+
+    def __init__(self, profile: BuildProfile, name: str, category: str, **args):
+        self.trace = profile.trace if profile is not None else None
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def start(self) -> "Span":
+        if self.trace is not None:
+            self.wall = time.perf_counter()
+
+        return self
+
+    def stop(self) -> None:
+        if self.trace is not None:
+            self.trace.add(
+                self.name,
+                self.category,
+                self.wall,
+                time.perf_counter() - self.wall,
+                self.args,
+            )
+
+    def __enter__(self) -> "Span":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> bool:
+        self.stop()
+
+        return False
+
+
+@contextmanager
+def record_calls(path: str):
+    """
+    Record every function call made in this process with cProfile, and save the statistics
+    to `path`. The file can be read with `python -m pstats <path>` or tools such as snakeviz.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,94 @@
+import os
+
+import orjson
+
+
+class RenderCache:
+    """
+    A size-bounded, content-addressed cache of rendered pages, stored on disk.
+
+    Each entry is saved in its own file named after its key. Reading an entry updates
+    its modification time, so eviction removes the least recently used entries first.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str):
+        """
+        Return the entry saved under `key`, or None if there is no such entry.
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                entry = orjson.loads(f.read())
+            os.utime(path)
+        except (OSError, orjson.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        """
+        Save an entry under `key`.
+
+        Entries are written to a temporary file and moved into place, so concurrent
+        builds and worker processes never read a partially written entry.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(temporary_path, "wb") as f:
+            f.write(orjson.dumps(entry))
+
+        os.replace(temporary_path, path)
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits in `max_size` bytes.
+
+        Returns the number of entries removed.
+        """
+        entries = []
+        total_size = 0
+
+        if not os.path.exists(self.directory):
+            return 0
+
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        removed = 0
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            total_size -= size
+            removed += 1
+
+        return removed
@@ -0,0 +1,196 @@
+import ctypes
+import errno
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# arguments to renameat2 on Linux, which can swap two paths in one atomic step
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def get_staging_prefix(site_directory: str) -> str:
+    return os.path.basename(os.path.normpath(site_directory)) + ".staging-"
+
+
+def is_staging_directory(site_directory: str, path: str) -> bool:
+    """
+    Check whether `path` is a staging directory created by Aurora for `site_directory`.
+    """
+    path = os.path.realpath(path)
+    parent = os.path.dirname(os.path.abspath(os.path.normpath(site_directory)))
+
+    if os.path.dirname(path) != os.path.realpath(parent):
+        return False
+
+    return os.path.basename(path).startswith(get_staging_prefix(site_directory))
+
+
+def create_staging_directory(site_directory: str) -> str:
+    """
+    Create an empty directory next to `site_directory` into which a build can be written.
+
+    Staging directories left behind by builds that did not finish are removed first.
+    """
+    site_directory = os.path.normpath(site_directory)
+    parent = os.path.dirname(os.path.abspath(site_directory))
+    prefix = get_staging_prefix(site_directory)
+    published = os.path.realpath(site_directory)
+
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+
+        if (
+            name.startswith(prefix)
+            and os.path.isdir(path)
+            and not os.path.islink(path)
+            and os.path.realpath(path) != published
+        ):
+            shutil.rmtree(path, ignore_errors=True)
+
+    staging_directory = tempfile.mkdtemp(prefix=prefix, dir=parent)
+
+    # mkdtemp only lets the current user read the directory, which the web server may not be
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(staging_directory, 0o777 & ~umask)
+
+    return staging_directory
+
+
+def get_renameat2():
+    """
+    Get `renameat2` from the C library, or None if it is not available.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), "renameat2", None)
+
+    if renameat2 is not None:
+        renameat2.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint,
+        ]
+
+    return renameat2
+
+
+def exchange_paths(first: str, second: str) -> None:
+    """
+    Swap two paths in one atomic step with `renameat2(RENAME_EXCHANGE)`.
+
+    Raises an OSError if the system or the filesystem does not support it.
+    """
+    renameat2 = get_renameat2()
+
+    if renameat2 is None:
+        raise OSError(errno.ENOSYS, "renameat2 is not available", first, None, second)
+
+    if renameat2(
+        AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE
+    ):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), first, None, second)
+
+
+def can_swap_site_directory(site_directory: str) -> bool:
+    """
+    Check whether a staging directory next to `site_directory` can replace it in one step.
+
+    This is not possible if `site_directory` is a mount point (i.e. a Docker volume) or is on
+    another filesystem than the folder it is in, or if it is a directory and the system
+    cannot swap two paths atomically.
+    """
+    site_directory = os.path.normpath(site_directory)
+
+    if os.path.islink(site_directory) or not os.path.exists(site_directory):
+        return True
+
+    if os.path.ismount(site_directory):
+        return False
+
+    parent = os.path.dirname(os.path.abspath(site_directory))
+
+    if os.stat(site_directory).st_dev != os.stat(parent).st_dev:
+        return False
+
+    return get_renameat2() is not None
+
+
+def swap_site_directory(site_directory: str, staging_directory: str) -> str:
+    """
+    Publish `staging_directory` as `site_directory`.
+
+    If `site_directory` is a symlink, the symlink is replaced in one atomic step. Otherwise,
+    the two directories are swapped in one atomic step, so the site is never missing or
+    half written. Raises an OSError if they cannot be swapped.
+
+    Returns the path of the old site, which can be removed, or None if there was no old site
+    that Aurora created. A directory the symlink pointed to is never returned unless it is
+    a staging directory from an earlier build.
+    """
+    site_directory = os.path.normpath(site_directory)
+
+    if os.path.islink(site_directory):
+        old_site = os.path.realpath(site_directory)
+        link = staging_directory + ".link"
+
+        # a relative link keeps working if the project is moved
+        os.symlink(os.path.basename(staging_directory), link)
+        os.replace(link, site_directory)
+
+        if is_staging_directory(site_directory, old_site) and os.path.isdir(old_site):
+            return old_site
+
+        return None
+
+    if not os.path.exists(site_directory):
+        os.rename(staging_directory, site_directory)
+
+        return None
+
+    exchange_paths(staging_directory, site_directory)
+
+    # the staging directory now holds the old site
+    return staging_directory
+
+
+def move_into_site_directory(site_directory: str, staging_directory: str) -> None:
+    """
+    Replace the contents of `site_directory` with those of `staging_directory`, for when
+    the two cannot be swapped. Unlike a swap, this is not atomic.
+    """
+    for name in os.listdir(site_directory):
+        path = os.path.join(site_directory, name)
+
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    for name in os.listdir(staging_directory):
+        shutil.move(
+            os.path.join(staging_directory, name), os.path.join(site_directory, name)
+        )
+
+    os.rmdir(staging_directory)
+
+
+def remove_in_background(path: str) -> threading.Thread:
+    """
+    Remove a directory tree on a background thread.
+
+    The thread is not a daemon thread, so the directory is fully removed before Aurora exits.
+    """
+    thread = threading.Thread(
+        target=shutil.rmtree, args=(path,), kwargs={"ignore_errors": True}
+    )
+    thread.start()
+
+    return thread
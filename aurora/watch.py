@@ -0,0 +1,90 @@
+import threading
+import time
+import traceback
+
+# the number of seconds to wait for more changes before rebuilding
+DEFAULT_DEBOUNCE_WINDOW = 0.25
+
+
+class ChangeCollector:
+    """
+    Collect the paths of changed files while serving, and rebuild the site once for all of them.
+
+    A rebuild starts once no file has changed for `window` seconds, so a `git pull` or an
+    editor saving every open file starts one rebuild rather than one per file. Files that
+    change while a rebuild is running are rebuilt together as soon as it has finished.
+
+    `rebuild` is called with a sorted list of the changed paths on a background thread, and
+    `on_rebuilt` (i.e. to reload open browser tabs) is called with the same list once every
+    change collected so far has been rebuilt.
+    """
+
+    def __init__(
+        self, rebuild, window: float = DEFAULT_DEBOUNCE_WINDOW, on_rebuilt=None
+    ):
+        self.rebuild = rebuild
+        self.window = window
+        self.on_rebuilt = on_rebuilt
+        self.pending = set()
+        self.last_change = 0
+        self.rebuilding = False
+        self.condition = threading.Condition()
+
+        # a daemon thread, so stopping the server does not wait for a rebuild to finish
+        self.thread = threading.Thread(target=self._rebuild_changes, daemon=True)
+        self.thread.start()
+
+    def add(self, paths: list) -> None:
+        """
+        Record that the files in `paths` have changed.
+        """
+        with self.condition:
+            self.pending.update(paths)
+            self.last_change = time.monotonic()
+            self.condition.notify_all()
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        """
+        Wait until every change collected so far has been rebuilt.
+
+        Returns False if `timeout` seconds passed first.
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: not self.pending and not self.rebuilding, timeout
+            )
+
+    def _rebuild_changes(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+
+                # wait until no file has changed for `window` seconds
+                while True:
+                    remaining = self.last_change + self.window - time.monotonic()
+
+                    if remaining <= 0:
+                        break
+
+                    self.condition.wait(remaining)
+
+                paths = sorted(self.pending)
+                self.pending.clear()
+                self.rebuilding = True
+
+            try:
+                self.rebuild(paths)
+            except Exception:
+                print(f"Error rebuilding {', '.join(paths)}:")
+                traceback.print_exc()
+
+            with self.condition:
+                caught_up = not self.pending
+
+            # if more files changed during the rebuild, browsers are reloaded after the next one
+            if caught_up and self.on_rebuilt:
+                self.on_rebuilt(paths)
+
+            with self.condition:
+                self.rebuilding = False
+                self.condition.notify_all()
@@ -0,0 +1,170 @@
+import os
+import queue
+import threading
+import time
+
+# the number of rendered pages that can wait to be written before rendering pauses
+MAX_QUEUED_PAGES = 64
+
+
+class SiteWriter:
+    """
+    Write pages to disk on a background thread as soon as they are rendered.
+
+    Pages wait in a bounded queue, so only a small number of rendered pages are held
+    in memory at once, no matter how large the site is.
+
+    If `skip_unchanged` is set, files whose contents are identical to the file already
+    on disk are left alone, so their modification times do not change.
+
+    If `staging_directory` is set, files are written there instead of `site_directory`.
+    Files whose contents are identical to the file in `site_directory` are hardlinked
+    from it rather than written again.
+    """
+
+    def __init__(
+        self,
+        max_queued_pages: int = MAX_QUEUED_PAGES,
+        skip_unchanged: bool = False,
+        site_directory: str = None,
+        staging_directory: str = None,
+    ):
+        self.queue = queue.Queue(maxsize=max_queued_pages)
+        self.skip_unchanged = skip_unchanged
+        self.site_directory = site_directory
+        self.staging_directory = staging_directory
+        self.error = None
+        self.written = 0
+        self.skipped = 0
+        self.queued = 0
+        # the wall and CPU time the background thread spent writing pages
+        self.write_time = 0.0
+        self.write_cpu_time = 0.0
+        self.paths = set()
+        self.thread = threading.Thread(target=self._write_queued_pages, daemon=True)
+        self.thread.start()
+
+    def write(self, path: str, contents) -> None:
+        """
+        Queue `contents` to be written to `path`. Blocks while the queue is full.
+        """
+        if self.error:
+            raise self.error
+
+        self.paths.add(os.path.normpath(path))
+        self.queue.put((path, contents))
+        self.queued += 1
+
+    def keep(self, path: str) -> None:
+        """
+        Record that the file at `path` is part of this build, without writing it again.
+        """
+        self.paths.add(os.path.normpath(path))
+
+    def get_staged_path(self, path: str) -> str:
+        """
+        Get the path in the staging directory of a file in the site directory.
+        """
+        return os.path.join(
+            self.staging_directory, os.path.relpath(path, self.site_directory)
+        )
+
+    def _write_staged_file(self, path: str, contents: bytes) -> None:
+        staged_path = self.get_staged_path(path)
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+
+        # a file written twice may be a link to a file in the site that is being served
+        if os.path.lexists(staged_path):
+            os.remove(staged_path)
+
+        if self.is_unchanged(path, contents):
+            try:
+                os.link(path, staged_path)
+                self.skipped += 1
+                return
+            except OSError:
+                # i.e. the filesystem does not support hardlinks
+                pass
+
+        with open(staged_path, "wb") as f:
+            f.write(contents)
+        self.written += 1
+
+    @staticmethod
+    def is_unchanged(path: str, contents: bytes) -> bool:
+        """
+        Check whether the file at `path` already contains `contents`.
+        """
+        try:
+            if os.path.getsize(path) != len(contents):
+                return False
+
+            with open(path, "rb") as f:
+                return f.read() == contents
+        except OSError:
+            return False
+
+    def _write_queued_pages(self) -> None:
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                break
+
+            path, contents = item
+            start, start_cpu = time.perf_counter(), time.thread_time()
+
+            try:
+                self._write_page(path, contents)
+            except Exception as e:
+                # keep draining the queue so that rendering is never blocked
+                self.error = e
+
+            self.write_time += time.perf_counter() - start
+            self.write_cpu_time += time.thread_time() - start_cpu
+
+    def _write_page(self, path: str, contents) -> None:
+        if isinstance(contents, str):
+            contents = contents.encode()
+
+        if self.staging_directory:
+            self._write_staged_file(path, contents)
+            return
+
+        if self.skip_unchanged and self.is_unchanged(path, contents):
+            self.skipped += 1
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(contents)
+        self.written += 1
+
+    def close(self) -> None:
+        """
+        Wait until every queued page has been written.
+
+        Raises the first error raised while writing, if any.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error:
+            raise self.error
+
+    def remove_unwritten_files(self, directory: str) -> int:
+        """
+        Remove every file in `directory` that was not passed to `write`.
+
+        Returns the number of files removed.
+        """
+        removed = 0
+
+        for root, _, files in os.walk(directory):
+            for file in files:
+                path = os.path.normpath(os.path.join(root, file))
+                if path not in self.paths:
+                    os.remove(path)
+                    removed += 1
+
+        return removed
@@ -0,0 +1,68 @@
+"""
+Benchmark turning data file records into pages.
+
+Usage:
+
+    python benchmarks/data_records.py
+    python benchmarks/data_records.py --records 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+SITE_CONFIG = """
+SITE_ENV = "production"
+BASE_URL = "https://example.com"
+ROOT_DIR = "pages"
+LAYOUTS_BASE_DIR = "_layouts"
+SITE_DIR = "_site"
+HOOKS = {}
+SITE_STATE = {}
+"""
+
+
+def make_records(count: int) -> list:
+    return [
+        {
+            "slug": f"book-{i}",
+            "layout": "book",
+            "title": f"Book {i}",
+            "author": f"Author {i % 1000}",
+            "year": 1900 + i % 120,
+            "rating": i % 50 / 10,
+            "tags": ["fiction", f"shelf-{i % 20}"],
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=500_000)
+    args = parser.parse_args()
+
+    site_folder = tempfile.mkdtemp()
+
+    with open(os.path.join(site_folder, "config.py"), "w") as f:
+        f.write(SITE_CONFIG)
+
+    # aurora.graph reads config.py from the working directory when it is imported
+    os.chdir(site_folder)
+
+    from aurora import graph
+
+    graph.all_data_files["books.json"] = make_records(args.records)
+
+    start = time.perf_counter()
+    graph.load_data_from_data_files([], {})
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{args.records:,} records: {elapsed:.2f}s ({args.records / elapsed:,.0f} records/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark linking pages to their previous and next pages, in general and in the same category.
+
+Usage:
+
+    python benchmarks/neighbour_linking.py
+    python benchmarks/neighbour_linking.py --sizes 10000 100000 --categories 500
+"""
+
+import argparse
+import random
+import time
+
+from aurora.neighbours import link_neighbouring_pages
+
+
+class Page:
+    __slots__ = ("metadata",)
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+def make_pages(count: int, categories: int) -> list:
+    random.seed(count)
+
+    pages = []
+
+    for i in range(count):
+        metadata = {"title": f"Page {i}", "permalink": f"/page-{i}/"}
+
+        # some pages have no categories, as in real sites
+        if i % 10:
+            metadata["categories"] = [f"category-{random.randrange(categories)}"]
+
+        pages.append(Page(metadata))
+
+    return pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--categories", type=int, default=100)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        pages = make_pages(size, args.categories)
+
+        start = time.perf_counter()
+        link_neighbouring_pages(pages)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{size:>9,} pages: {elapsed:.3f}s ({elapsed / size * 1_000_000:.2f}µs per page)"
+        )
+
+
+if __name__ == "__main__":
+    main()
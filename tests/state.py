@@ -1,5 +1,7 @@
+import json
 import os
 import shutil
+import subprocess
 
 TEST_FOLDER = os.path.join(os.getcwd(), "tests/library")
 BASE_SITE_DIRECTORY = os.path.join(TEST_FOLDER, "_site")
@@ -21,6 +23,129 @@ def test_build_site():
     assert os.path.exists("_site")
 
 
+def test_dependencies_only_include_referenced_collections():
+    from aurora.graph import all_dependencies, collections_to_files
+
+    book_files = set(collections_to_files["books"])
+
+    assert book_files <= all_dependencies["pages/templates/book_list.html"]
+    assert not book_files & all_dependencies["pages/templates/about.html"]
+
+
+def test_data_record_pages_do_not_modify_records():
+    from aurora.graph import all_parsed_pages, parse_data_record
+
+    record = {"slug": "emma", "layout": "book-template", "body": "A novel."}
+
+    _, parsed_page = parse_data_record(record, json.dumps(record), "books")
+
+    assert parsed_page["content"] == "A novel."
+    assert "body" not in parsed_page
+    assert record == {"slug": "emma", "layout": "book-template", "body": "A novel."}
+    assert (
+        all_parsed_pages["books/the-great-gatsby/index.html"]["title"]
+        == "The Great Gatsby"
+    )
+
+
+def test_csv_data_files_are_read_with_declared_column_types(tmp_path):
+    import datetime
+
+    from aurora.data_files import iterate_csv
+
+    data_file = tmp_path / "reviews.csv"
+    data_file.write_text(
+        'name,review,stars,date\nJames,"A long,\nexcellent book.", 5,2023-01-02\nAmy,Good.,,2023-02-03\n'
+    )
+
+    reviews = list(iterate_csv(data_file, {"stars": "int", "date": "date"}))
+
+    assert reviews == [
+        {
+            "name": "James",
+            "review": "A long,\nexcellent book.",
+            "stars": 5,
+            "date": datetime.date(2023, 1, 2),
+        },
+        {
+            "name": "Amy",
+            "review": "Good.",
+            "stars": None,
+            "date": datetime.date(2023, 2, 3),
+        },
+    ]
+
+
+def test_layout_chains_are_compiled_once():
+    from aurora.graph import all_parsed_pages, get_layout_chain
+
+    chain = get_layout_chain("rooms")
+
+    assert [os.path.basename(layout.path) for layout in chain] == [
+        "rooms.html",
+        "default.html",
+    ]
+    assert get_layout_chain("rooms") is chain
+    assert get_layout_chain("date")[-1] is chain[-1]
+    # rendering pages must not leak page metadata into the layouts' front matter
+    assert "page" not in all_parsed_pages[chain[-1].path].metadata
+
+
+def test_front_matter_expressions_are_compiled_once():
+    from aurora.graph import compile_front_matter_expression, interpolate_front_matter
+
+    expression = "{{ page.title }} - {{ site.name }}"
+
+    assert compile_front_matter_expression(
+        expression
+    ) is compile_front_matter_expression(expression)
+    assert (
+        interpolate_front_matter(
+            {"title": "About", "description": expression}, {"name": "Library"}
+        )["description"]
+        == "About - Library"
+    )
+
+
+def test_neighbouring_pages_match_nearest_page_in_same_category():
+    from frontmatter import Post
+
+    from aurora.neighbours import link_neighbouring_pages
+
+    categories = [["a"], None, ["b"], ["a"], [], "missing", ["a", "b"], None, ["b"]]
+    pages = []
+
+    for i, category in enumerate(categories):
+        page = Post("", title=f"Page {i}", permalink=f"/{i}/")
+        if category != "missing":
+            page["categories"] = category
+        pages.append(page)
+
+    link_neighbouring_pages(pages)
+
+    def nearest(i, indexes):
+        for j in indexes:
+            if pages[j].metadata.get("categories", []) == pages[i].metadata.get(
+                "categories"
+            ):
+                return {"url": f"/{j}/", "title": f"Page {j}"}
+
+    for i, page in enumerate(pages):
+        assert page.get("previous_in_same_category") == (
+            nearest(i, range(i + 1, len(pages))) if i < len(pages) - 1 else None
+        )
+        assert page.get("next_in_same_category") == (
+            nearest(i, range(i - 1, -1, -1)) if i > 0 else None
+        )
+
+    assert pages[0]["previous"] == {"url": "/1/", "title": "Page 1"}
+    assert pages[0]["previous_in_same_category"]["url"] == "/3/"
+    assert pages[1]["previous_in_same_category"]["url"] == "/7/"
+    assert pages[4].get("next_in_same_category") is None
+    assert pages[4]["previous_in_same_category"]["url"] == "/5/"
+    assert "next" not in pages[0].metadata
+
+
 def test_config_file_presence():
     assert os.path.exists("config.py")
 
@@ -155,6 +280,17 @@ def test_tag_archive_generation():
     ].strip().replace(" ", "").replace("\n", "")
 
 
+def test_archive_index_lists_posts_once_per_tag():
+    from aurora.graph import get_archive_index, state
+
+    index = get_archive_index("tags")
+
+    assert index["Announcements"] == [
+        post for post in state["posts"] if "Announcements" in post.get("tags", [])
+    ]
+    assert all(len(posts) == len(set(map(id, posts))) for posts in index.values())
+
+
 def test_collection_pagination():
     with open(os.path.join(BASE_SITE_DIRECTORY, "rooms/index.html")) as f:
         data = f.read()
@@ -164,6 +300,717 @@ def test_collection_pagination():
     ].strip().replace(" ", "").replace("\n", "")
 
 
+def copy_test_site(tmp_path):
+    """
+    Copy the test site to `tmp_path`, without the output and state of earlier builds.
+    """
+    site_folder = tmp_path / "library"
+    shutil.copytree(
+        TEST_FOLDER, site_folder, ignore=shutil.ignore_patterns("_site", "state.json")
+    )
+
+    return site_folder
+
+
+def run_build(site_folder, *args):
+    """
+    Run `aurora build` with `args` in `site_folder`, and return the finished process.
+    """
+    return subprocess.run(
+        ["aurora", "build", *args],
+        cwd=site_folder,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def read_site_files(site_directory):
+    site_files = {}
+
+    for root, _, files in os.walk(site_directory):
+        for file in files:
+            path = os.path.join(root, file)
+            with open(path, "rb") as f:
+                site_files[os.path.relpath(path, site_directory)] = f.read()
+
+    return site_files
+
+
+def test_parallel_build_matches_serial_build(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder)
+    serial_build = read_site_files(site_folder / "_site")
+
+    run_build(site_folder, "--jobs", "2")
+    parallel_build = read_site_files(site_folder / "_site")
+
+    assert serial_build == parallel_build
+
+
+def test_render_cache_reuses_rendered_pages(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('SITE_STATE["render_cache"] = True\n')
+
+    run_build(site_folder)
+    first_build = read_site_files(site_folder / "_site")
+
+    result = run_build(site_folder)
+
+    assert "0 misses" in result.stdout
+    assert read_site_files(site_folder / "_site") == first_build
+
+
+def test_render_cache_key_covers_hook_code(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('SITE_STATE["render_cache"] = True\n')
+        f.write('HOOKS["post_template_generation"] = {"hooks": ["add_version"]}\n')
+
+    with open(site_folder / "hooks.py", "a") as f:
+        f.write(
+            "\n\ndef add_version(file_name, page_state, state, rendered):\n"
+            '    with open("hook-calls.txt", "a") as f:\n'
+            '        f.write(file_name + "\\n")\n\n'
+            '    return rendered + "<!-- v1 -->"\n'
+        )
+
+    with open(site_folder / "pages/templates/about.html", "a") as f:
+        f.write('\n<p>{{ "hello" | capitalize }}</p>\n')
+
+    run_build(site_folder)
+
+    about_page = (site_folder / "_site/about/index.html").read_text()
+    assert "<!-- v1 -->" in about_page and "HELLO" in about_page
+
+    # hooks run for pages taken from the cache
+    result = run_build(site_folder)
+
+    assert "0 misses" in result.stdout
+    assert (site_folder / "hook-calls.txt").read_text().count(
+        "pages/templates/about.html"
+    ) == 2
+
+    hooks = (site_folder / "hooks.py").read_text()
+    (site_folder / "hooks.py").write_text(
+        hooks.replace("v1", "v2").replace("text.upper()", 'text.lower() + "!"')
+    )
+
+    result = run_build(site_folder)
+
+    assert "0 hits" in result.stdout
+
+    about_page = (site_folder / "_site/about/index.html").read_text()
+    assert "<!-- v2 -->" in about_page and "hello!" in about_page
+
+
+def test_render_cache_does_not_cache_pages_that_read_whole_site(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('SITE_STATE["render_cache"] = True\n')
+
+    (site_folder / "pages/templates/subscripted.html").write_text(
+        '{% for post in site["posts"] %}{{ post.title }}{% endfor %}\n'
+    )
+    (site_folder / "pages/templates/method.html").write_text(
+        '{% for post in site.get("posts") %}{{ post.title }}{% endfor %}\n'
+    )
+
+    run_build(site_folder)
+
+    post = site_folder / "pages/posts/2024-01-01-first-post.md"
+    post.write_text(post.read_text().replace("Hello, World!", "Renamed"))
+
+    run_build(site_folder)
+
+    for page in ("subscripted", "method"):
+        assert "Renamed" in (site_folder / "_site" / page / "index.html").read_text()
+
+
+def test_incremental_build_ignores_touched_but_unchanged_files(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder, "--incremental")
+
+    # i.e. after a `git checkout` or a CI cache restore
+    about_page = site_folder / "pages/templates/about.html"
+    os.utime(about_page, (os.path.getatime(about_page) + 60,) * 2)
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "No changes detected" in result.stdout
+
+    with open(about_page, "a") as f:
+        f.write("\n<p>Open every day.</p>\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "Detected change in pages/templates/about.html" in result.stdout
+
+
+def test_incremental_build_only_regenerates_changed_date_archives(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        assert set(json.load(f)["date_archive_fingerprints"]) == {
+            "2024",
+            "2024/01",
+            "2024/01/01",
+        }
+
+    with open(site_folder / "pages/templates/about.html", "a") as f:
+        f.write("\n<p>Open every day.</p>\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "Generated 0 date archives (3 unchanged)" in result.stdout
+
+    with open(site_folder / "pages/posts/2024-01-01-first-post.md", "a") as f:
+        f.write("\nThanks for reading.\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "Generated 3 date archives (0 unchanged)" in result.stdout
+
+
+def test_incremental_build_skips_unchanged_paginated_pages(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        assert list(json.load(f)["paginator_fingerprints"]) == ["rooms/index.html"]
+
+    with open(site_folder / "pages/templates/about.html", "a") as f:
+        f.write("\n<p>Open every day.</p>\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "Generating paginated page 1 for rooms" not in result.stdout
+    assert (site_folder / "_site/rooms/index.html").exists()
+
+    room = site_folder / "pages/rooms/study-hall.html"
+    room.write_text(room.read_text().replace("Study Hall", "Reading Room"))
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "Generating paginated page 1 for rooms" in result.stdout
+    assert "Reading Room" in (site_folder / "_site/rooms/index.html").read_text()
+
+
+def test_incremental_build_caches_outgoing_links(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["enable_backlinks"] = True\n')
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        outgoing_links = json.load(f)["outgoing_links"]
+
+    assert outgoing_links["pages/templates/index.html"]["links"] == ["/books/"]
+
+    with open(site_folder / "pages/templates/about.html", "a") as f:
+        f.write('\n<p><a href="/book-list/">See all books</a>.</p>\n')
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        updated_outgoing_links = json.load(f)["outgoing_links"]
+
+    assert (
+        "/book-list/" in updated_outgoing_links["pages/templates/about.html"]["links"]
+    )
+    assert (
+        updated_outgoing_links["pages/templates/index.html"]
+        == outgoing_links["pages/templates/index.html"]
+    )
+
+
+def test_streamed_data_file_matches_loaded_data_file(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder)
+    loaded_build = read_site_files(site_folder / "_site")
+    shutil.rmtree(site_folder / "_site")
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["streamed_data_files"] = ["books.json"]\n')
+        f.write('SITE_STATE["data_chunk_size"] = 1\n')
+
+    run_build(site_folder)
+
+    assert read_site_files(site_folder / "_site") == loaded_build
+
+
+def test_streamed_data_file_renders_every_chunk_in_worker_processes(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    books = [
+        {
+            "title": f"Book {number}",
+            "author": "Anonymous",
+            "layout": "book-template",
+            "slug": f"book-{number}",
+        }
+        for number in range(7)
+    ]
+    (site_folder / "pages/_data/books.json").write_text(json.dumps(books))
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["streamed_data_files"] = ["books.json"]\n')
+        f.write('SITE_STATE["data_chunk_size"] = 3\n')
+
+    run_build(site_folder)
+    serial_build = read_site_files(site_folder / "_site")
+
+    run_build(site_folder, "--jobs", "2")
+
+    assert read_site_files(site_folder / "_site") == serial_build
+    assert b"<h1>Book 6</h1>" in serial_build["books/book-6/index.html"]
+
+
+def test_incremental_build_only_hashes_records_of_changed_data_files(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        data_file_integrity = json.load(f)["data_file_integrity"]
+
+    assert set(data_file_integrity) == {"books.json", "reviews.csv"}
+    assert set(data_file_integrity["books.json"]["records"]) == {"the-great-gatsby"}
+
+    with open(site_folder / "pages/_data/reviews.csv", "a") as f:
+        f.write("\nAmy,A good read.,4,reader-review\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        updated_data_file_integrity = json.load(f)["data_file_integrity"]
+
+    assert "Generating and saving pages" in result.stdout
+    assert os.path.exists(site_folder / "_site/reviews/1/index.html")
+    assert (
+        updated_data_file_integrity["books.json"] == data_file_integrity["books.json"]
+    )
+    assert set(updated_data_file_integrity["reviews.csv"]["records"]) == {"0", "1"}
+
+
+def test_incremental_build_skips_unchanged_streamed_data_files(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["streamed_data_files"] = ["books.json"]\n')
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "pages/templates/about.html", "a") as f:
+        f.write("\n<p>Open every day.</p>\n")
+
+    result = run_build(site_folder, "--incremental")
+
+    assert "books.json has not changed" in result.stdout
+
+    with open(site_folder / "pages/_layouts/book-template.html", "a") as f:
+        f.write("\n<p>Part of the library.</p>\n")
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "_site/books/the-great-gatsby/index.html") as f:
+        assert "Part of the library." in f.read()
+
+
+def test_detected_encodings_are_saved_between_incremental_builds(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    legacy_page = site_folder / "pages/templates/legacy.html"
+    legacy_page.write_bytes(
+        "---\ntitle: Legacy\npermalink: /legacy/\n---\r\n<p>The caf\u00e9 \u2013 \u201cour\u201d favourite \u2013 is open.</p>\r\n".encode(
+            "windows-1252"
+        )
+    )
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        file_encodings = json.load(f)["file_encodings"]
+
+    assert "pages/templates/legacy.html" in file_encodings
+    assert "pages/templates/about.html" not in file_encodings
+
+    with open(site_folder / "_site/legacy/index.html", encoding="utf-8") as f:
+        assert (
+            "<p>The caf\u00e9 \u2013 \u201cour\u201d favourite \u2013 is open.</p>"
+            in f.read()
+        )
+
+
+def test_csv_data_files_are_read_in_detected_encoding(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    (site_folder / "pages/_data/reviews.csv").write_bytes(
+        "name,review,star,layout\r\nJames,The caf\u00e9 \u2013 \u201cour\u201d favourite.,5,reader-review\r\n".encode(
+            "windows-1252"
+        )
+    )
+
+    run_build(site_folder, "--incremental")
+
+    with open(site_folder / "state.json") as f:
+        assert "pages/_data/reviews.csv" in json.load(f)["file_encodings"]
+
+    with open(site_folder / "_site/reviews/0/index.html", encoding="utf-8") as f:
+        assert "The caf\u00e9 \u2013 \u201cour\u201d favourite." in f.read()
+
+
+def test_full_build_only_copies_changed_assets(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    (site_folder / "assets/old.css").write_text("p { color: red; }")
+
+    run_build(site_folder)
+
+    published_assets = {
+        path: os.stat(path).st_ino
+        for path in (site_folder / "_site/assets").iterdir()
+        if path.is_file()
+    }
+
+    (site_folder / "assets/old.css").unlink()
+    (site_folder / "assets/new.css").write_text("p { color: blue; }")
+
+    result = run_build(site_folder)
+
+    assert "Copied 1 assets (2 unchanged)" in result.stdout
+    assert not (site_folder / "_site/assets/old.css").exists()
+    assert (site_folder / "_site/assets/new.css").read_text() == "p { color: blue; }"
+
+    for path, inode in published_assets.items():
+        if path.name != "old.css":
+            assert os.stat(path).st_ino == inode
+
+
+def test_full_build_replaces_site_with_staged_build(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["staged_builds"] = True\n')
+
+    run_build(site_folder)
+    first_build = read_site_files(site_folder / "_site")
+    about_page = site_folder / "_site/about/index.html"
+    about_page_inode = os.stat(about_page).st_ino
+
+    (site_folder / "_site/stale.html").write_text("<p>Removed page</p>")
+
+    with open(site_folder / "pages/templates/index.html", "a") as f:
+        f.write("\n<p>Open every day.</p>\n")
+
+    run_build(site_folder)
+
+    assert os.stat(about_page).st_ino == about_page_inode
+    assert not (site_folder / "_site/stale.html").exists()
+    assert "Open every day." in (site_folder / "_site/index.html").read_text()
+    assert set(read_site_files(site_folder / "_site")) == set(first_build)
+    # the staging directory and the old site are gone
+    assert not [name for name in os.listdir(site_folder) if name.startswith("_site.")]
+
+
+def test_staged_build_replaces_site_symlink(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    with open(site_folder / "config.py", "a") as f:
+        f.write('\nSITE_STATE["staged_builds"] = True\n')
+
+    (site_folder / "_site_v1").mkdir()
+    (site_folder / "_site_v1/notes.txt").write_text("Not part of the site.")
+    os.symlink("_site_v1", site_folder / "_site")
+
+    run_build(site_folder)
+
+    assert os.path.islink(site_folder / "_site")
+    assert os.path.exists(site_folder / "_site/about/index.html")
+    # the directory the symlink pointed to belongs to the user, so it is kept
+    assert (site_folder / "_site_v1/notes.txt").exists()
+
+    first_build = os.path.realpath(site_folder / "_site")
+
+    run_build(site_folder)
+
+    assert os.path.realpath(site_folder / "_site") != first_build
+    # staging directories from earlier builds are removed
+    assert not os.path.exists(first_build)
+    assert (site_folder / "_site_v1/notes.txt").exists()
+
+
+def test_site_directory_is_swapped_with_staging_directory(tmp_path):
+    from aurora.staging import move_into_site_directory, swap_site_directory
+
+    for name in ["_site", "_site.staging-1", "_site.staging-2"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "index.html").write_text(name)
+
+    old_site = swap_site_directory(
+        str(tmp_path / "_site"), str(tmp_path / "_site.staging-1")
+    )
+
+    assert old_site == str(tmp_path / "_site.staging-1")
+    assert (tmp_path / "_site/index.html").read_text() == "_site.staging-1"
+    assert (tmp_path / "_site.staging-1/index.html").read_text() == "_site"
+
+    # used if the directories cannot be swapped, i.e. if _site is a mount point
+    move_into_site_directory(str(tmp_path / "_site"), str(tmp_path / "_site.staging-2"))
+
+    assert (tmp_path / "_site/index.html").read_text() == "_site.staging-2"
+    assert not (tmp_path / "_site.staging-2").exists()
+
+
+def test_resident_rebuild_updates_changed_page(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    # both builds run in one process, as they do while serving
+    script = """
+import json
+from aurora import graph
+
+graph.main(resident=True)
+pages = len(graph.all_pages)
+
+with open("pages/posts/2024-01-01-first-post.md", "a") as f:
+    f.write("Edited while serving.")
+
+graph.main(deps=["pages/posts/2024-01-01-first-post.md"], incremental=True, resident=True)
+
+print(json.dumps({"pages": [pages, len(graph.all_pages)], "posts": len(graph.state["posts"])}))
+"""
+
+    result = subprocess.run(
+        ["python", "-c", script],
+        cwd=site_folder,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    counts = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert counts["pages"][0] == counts["pages"][1]
+    assert counts["posts"] == 1
+    assert (
+        "Edited while serving."
+        in (site_folder / "_site/2024/01/01/first-post/index.html").read_text()
+    )
+    assert not (site_folder / "state.json").exists()
+
+
+def test_resident_rebuild_keeps_post_order(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    # posts are sorted by their slug before rendering, which removes the date from it
+    (site_folder / "pages/posts/2024-02-01-apple.md").write_text(
+        "---\ntitle: Apple\nlayout: post\n---\n\nAn apple.\n"
+    )
+
+    script = """
+import json
+from aurora import graph
+
+graph.main(resident=True)
+order = [post["title"] for post in graph.state["posts"]]
+
+with open("pages/posts/2024-02-01-apple.md", "a") as f:
+    f.write("Edited while serving.")
+
+graph.main(deps=["pages/posts/2024-02-01-apple.md"], incremental=True, resident=True)
+
+print(json.dumps([order, [post["title"] for post in graph.state["posts"]]]))
+"""
+
+    result = subprocess.run(
+        ["python", "-c", script],
+        cwd=site_folder,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    first_build, rebuild = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert first_build[0] == "Apple"
+    assert rebuild == first_build
+
+
+def test_resident_rebuild_updates_neighbours_and_archives_of_changed_page(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    post_layout = site_folder / "pages/_layouts/post.html"
+    post_layout.write_text(
+        post_layout.read_text().replace(
+            "{{ content }}", "{{ content }}\n<nav>{{ post.previous.title }}</nav>"
+        )
+    )
+    (site_folder / "pages/posts/2024-02-01-second-post.md").write_text(
+        "---\ntitle: Second\nlayout: post\ncategories:\n- Featured\n---\n\nA second post.\n"
+    )
+    # neither post is a neighbour of the first post
+    (site_folder / "pages/posts/2023-06-01-spring-post.md").write_text(
+        "---\ntitle: Spring\nlayout: post\n---\n\nA spring post.\n"
+    )
+    (site_folder / "pages/posts/2023-01-01-old-post.md").write_text(
+        "---\ntitle: Old\nlayout: post\ntags:\n- Other\n---\n\nAn old post.\n"
+    )
+
+    script = """
+import os
+from aurora import graph
+
+graph.main(resident=True)
+first_build = os.stat("_site/tag/other/index.html").st_mtime_ns
+
+with open("pages/posts/2024-01-01-first-post.md") as f:
+    contents = f.read()
+
+with open("pages/posts/2024-01-01-first-post.md", "w") as f:
+    f.write(contents.replace("Hello, World!", "Renamed while serving"))
+
+graph.main(deps=["pages/posts/2024-01-01-first-post.md"], incremental=True, resident=True)
+print(first_build, os.stat("_site/tag/other/index.html").st_mtime_ns)
+"""
+
+    result = subprocess.run(
+        ["python", "-c", script],
+        cwd=site_folder,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    first_build, rebuild = result.stdout.strip().splitlines()[-1].split()
+
+    # the second post links to the first post, which it was not changed with
+    assert (
+        "<nav>Renamed while serving</nav>"
+        in (site_folder / "_site/2024/02/01/second-post/index.html").read_text()
+    )
+
+    for archive in ("category/featured", "tag/announcements", "2024"):
+        assert (
+            "Renamed while serving"
+            in (site_folder / "_site" / archive / "index.html").read_text()
+        )
+
+    # archives that do not list the changed post are not generated again
+    assert first_build == rebuild
+
+
+def test_change_collector_rebuilds_bursts_of_changes_once():
+    from aurora.watch import ChangeCollector
+
+    rebuilds = []
+    changes = ChangeCollector(rebuilds.append, window=0.1)
+
+    for path in [
+        "pages/templates/about.html",
+        "pages/posts/a.md",
+        "pages/templates/about.html",
+    ]:
+        changes.add([path])
+
+    assert changes.wait_until_idle(timeout=5)
+    assert rebuilds == [["pages/posts/a.md", "pages/templates/about.html"]]
+
+
+def test_change_collector_merges_changes_made_during_a_rebuild():
+    from aurora.watch import ChangeCollector
+
+    rebuilds = []
+    reloads = []
+
+    def rebuild(paths):
+        rebuilds.append(paths)
+
+        if len(rebuilds) == 1:
+            changes.add(["pages/posts/b.md"])
+            changes.add(["pages/posts/c.md"])
+
+    changes = ChangeCollector(rebuild, window=0.1, on_rebuilt=reloads.append)
+    changes.add(["pages/posts/a.md"])
+
+    assert changes.wait_until_idle(timeout=5)
+    assert rebuilds == [
+        ["pages/posts/a.md"],
+        ["pages/posts/b.md", "pages/posts/c.md"],
+    ]
+    # browsers are only reloaded once every change has been rebuilt
+    assert reloads == [["pages/posts/b.md", "pages/posts/c.md"]]
+
+
+def test_write_if_changed_leaves_unchanged_files_alone(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    run_build(site_folder)
+    first_build = read_site_files(site_folder / "_site")
+    about_page = site_folder / "_site/about/index.html"
+    modified = os.path.getmtime(about_page)
+
+    (site_folder / "_site/stale.html").write_text("<p>Removed page</p>")
+
+    result = run_build(site_folder, "--write-if-changed")
+
+    assert "Wrote 0 files" in result.stdout
+    assert os.path.getmtime(about_page) == modified
+    assert read_site_files(site_folder / "_site") == first_build
+
+
+def test_profiled_build_reports_phases(tmp_path):
+    import pstats
+
+    site_folder = copy_test_site(tmp_path)
+
+    result = run_build(site_folder, "--profile", "--profile-output", "build.prof")
+
+    for phase in [
+        "page read",
+        "  front matter parse",
+        "dependency analysis",
+        "render",
+        "  pre_template_generation hook hooks.retrieve_visitor_count",
+        "date archives",
+        "post_build hook hooks.add_made_by_file",
+    ]:
+        assert f"\n{phase} " in result.stdout
+
+    assert pstats.Stats(str(site_folder / "build.prof")).total_calls > 0
+
+
+def test_traced_build_saves_chrome_trace(tmp_path):
+    site_folder = copy_test_site(tmp_path)
+
+    result = run_build(site_folder, "--trace", "trace.json")
+
+    with open(site_folder / "trace.json") as f:
+        events = json.load(f)["traceEvents"]
+
+    spans = [event for event in events if event["ph"] == "X"]
+    categories = {span["cat"] for span in spans}
+
+    assert {"phase", "page", "layout", "hook", "data collection"} <= categories
+    assert all(span["dur"] >= 0 for span in spans)
+    assert any(
+        span["cat"] == "page" and span["name"] == "pages/templates/index.html"
+        for span in spans
+    )
+
+    assert "Slowest pages:" in result.stdout
+    assert "Slowest layouts:" in result.stdout
+
+
 def check_for_presence_of_state_file_after_build():
     assert os.path.exists("state.json")
 
@@ -186,3 +1033,17 @@ def test_incremental_regeneration():
             )
 
     assert set(generated_files) == set(new_generated_files)
+
+
+def test_incremental_build_saves_dependency_graph():
+    with open("state.json") as f:
+        saved_state = json.load(f)
+
+    assert (
+        "pages/_layouts/default.html"
+        in saved_state["dependencies"]["pages/templates/about.html"]
+    )
+    assert (
+        "pages/templates/about.html"
+        in saved_state["reverse_dependencies"]["pages/_layouts/default.html"]
+    )